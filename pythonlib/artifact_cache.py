@@ -0,0 +1,160 @@
+"""
+Local content-addressable cache for files downloaded from Artifactory
+"""
+import fcntl
+import logging
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+
+
+# Default cap on the total size of the cache, in bytes
+DEFAULT_CACHE_SIZE = 10 * 1024 * 1024 * 1024
+
+
+class ArtifactCache:
+    """On-disk cache of artifacts keyed by their SHA-256 checksum.
+
+    Entries are stored as `<cache_dir>/<first two hex digits>/<sha256>`. Entries are written to a temporary file and
+    renamed into place, so readers never see a partial entry and several processes on the same host can share one
+    cache directory. Eviction is least-recently-used (the modification time of an entry is bumped on every hit) and
+    is serialized between processes with a lock file.
+
+    Files served from the cache are hardlinked when possible. A hardlinked file shares its data with the cache entry,
+    so it must be replaced rather than modified in place; set `use_hardlinks=False` to always get a private copy.
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_CACHE_SIZE, use_hardlinks=True):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = max_size
+        self.use_hardlinks = use_hardlinks
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.lock_file = os.path.join(self.cache_dir, '.lock')
+
+    def _entry_path(self, sha256):
+        """Location of the cache entry for a given checksum.
+
+        :param sha256:  SHA-256 checksum of the artifact
+        :type sha256:   str
+        :return:        Path of the cache entry
+        :rtype:         str
+        """
+        return os.path.join(self.cache_dir, sha256[:2], sha256)
+
+    @contextmanager
+    def _lock(self):
+        """Hold an exclusive lock on the cache directory that is shared with other processes."""
+        with open(self.lock_file, 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def fetch(self, sha256, local_file):
+        """Serve a cached artifact to a local path.
+
+        :param sha256:      SHA-256 checksum of the artifact
+        :type sha256:       str
+        :param local_file:  Path where the artifact should be placed. An existing file is replaced.
+        :type local_file:   str
+        :return:            True if the artifact was in the cache, else False
+        :rtype:             bool
+        """
+        entry = self._entry_path(sha256)
+        temp_file = f'{local_file}.{uuid.uuid4().hex[:8]}.part'
+
+        try:
+            # Bump the modification time first so a concurrent eviction treats the entry as recently used
+            os.utime(entry)
+
+            if self.use_hardlinks:
+                try:
+                    os.link(entry, temp_file)
+                except OSError:
+                    shutil.copyfile(entry, temp_file)
+            else:
+                shutil.copyfile(entry, temp_file)
+
+            os.replace(temp_file, local_file)
+        except FileNotFoundError:
+            logging.debug(f'Cache miss for {sha256}')
+            return False
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+        logging.info(f'Cache hit for {sha256}; saved to {local_file}')
+        return True
+
+    def store(self, sha256, local_file):
+        """Add a local file to the cache.
+
+        The caller is responsible for making sure `sha256` is the checksum of the file. Once the file is added, the
+        least recently used entries are evicted until the cache is within its size cap.
+
+        :param sha256:      SHA-256 checksum of the file
+        :type sha256:       str
+        :param local_file:  Path of the file to add
+        :type local_file:   str
+        :return:            None
+        :rtype:             None
+        """
+        entry = self._entry_path(sha256)
+
+        if os.path.exists(entry):
+            os.utime(entry)
+            return
+
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        temp_file = f'{entry}.{uuid.uuid4().hex[:8]}.part'
+
+        try:
+            shutil.copyfile(local_file, temp_file)
+            os.replace(temp_file, entry)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+        logging.debug(f'Added {local_file} to the cache as {sha256}')
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache is within its size cap.
+
+        :return:    Number of bytes removed
+        :rtype:     int
+        """
+        with self._lock():
+            entries = []
+            for sub_dir in os.scandir(self.cache_dir):
+                if not sub_dir.is_dir():
+                    continue
+                for entry in os.scandir(sub_dir.path):
+                    if entry.name.endswith('.part'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total_size = sum(size for _, size, _ in entries)
+            removed = 0
+
+            for _, size, path in sorted(entries):
+                if total_size - removed <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                    removed += size
+                except FileNotFoundError:
+                    pass
+
+        if removed:
+            logging.info(f'Evicted {removed} bytes from the artifact cache')
+
+        return removed
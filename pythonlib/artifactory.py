@@ -1,28 +1,267 @@
 """
 Module for abstracting interactions with Artifactory
 """
+# pylint: disable=too-many-lines
+import hashlib
 import json
 import logging
 import os
-import urllib3
+import posixpath
+import random
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote
 
+import urllib3
 import requests
+from requests.adapters import HTTPAdapter
 
-from .checksum import generate_checksum
+from .checksum import generate_checksums
 from .string_helper import remove_from_start_if_present
+from .transfer import BandwidthLimiter, MeteredReader, TransferStats, metered_chunks
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
 DEFAULT_ARTIFACTORY_URL = ''
 
+# Number of concurrent transfers used by the batch methods; the HTTP connection pool is sized to match
+DEFAULT_MAX_WORKERS = 8
+
+# Size of the chunks streamed during transfers; large chunks keep the number of writes and hash updates low
+TRANSFER_CHUNK_SIZE = 1024 * 1024
+
+# Size of the byte ranges fetched in parallel by segmented downloads
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+# Responses that mean the server is overloaded or briefly unavailable, so the request can be retried
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+# HTTP methods that are safe to send again
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+# upload_stream keeps payloads up to this size in memory and spools anything larger to a temporary file
+SPOOL_MAX_MEMORY = 16 * 1024 * 1024
+
+# upload_files bundles files into a single exploded archive when there are at least this many files...
+BUNDLE_MIN_FILES = 20
+
+# ...and their average size is no larger than this, so per-request overhead would dominate the transfer
+BUNDLE_MAX_AVERAGE_SIZE = 256 * 1024
+
+# Number of (repository, path) pairs resolved by each AQL query in a bulk lookup
+AQL_BATCH_SIZE = 500
+
+# Number of results fetched by each AQL query when paging through large result sets
+AQL_PAGE_SIZE = 1000
+
+# Checksum headers Artifactory sends with artifacts, ordered from strongest to weakest
+CHECKSUM_HEADERS = {
+    'sha256': 'X-Checksum-Sha256',
+    'sha1': 'X-Checksum-Sha1',
+    'md5': 'X-Checksum-Md5',
+}
+
 
 class ArtifactoryRequestException(Exception):
     """Custom exception for Artifactory errors"""
 
 
-class Artifactory:
-    """Abstracts interactions with Artifactory"""
+class _ZipStream:
+    """Write-only file object that buffers what `zipfile` writes so it can be sent on in chunks"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        """Buffer data written by `zipfile`"""
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        """Nothing to flush; data is handed out by `drain()`"""
+
+    def drain(self):
+        """Return and clear everything buffered so far"""
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def _zip_chunks(files):
+    """Build a zip archive on the fly, yielding it in chunks as it is written.
+
+    Only about one chunk of the archive is held in memory at a time, so the archive can be streamed as a request
+    body without being staged on disk.
+
+    :param files:   Mapping of the name in the archive to the local file to add
+    :type files:    dict
+    :return:        Generator yielding the bytes of the archive
+    :rtype:         generator
+    """
+    stream = _ZipStream()
+
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for arcname, local_file in files.items():
+            # Zip can't store times before 1980, which reproducible builds often use; clamp them instead of failing
+            zip_info = zipfile.ZipInfo.from_file(local_file, arcname, strict_timestamps=False)
+            zip_info.compress_type = zipfile.ZIP_DEFLATED
+
+            with open(local_file, 'rb') as src, archive.open(zip_info, 'w') as dest:
+                for block in iter(lambda: src.read(TRANSFER_CHUNK_SIZE), b''):  # pylint: disable=cell-var-from-loop
+                    dest.write(block)
+                    if len(stream.buffer) >= TRANSFER_CHUNK_SIZE:
+                        yield stream.drain()
+
+    yield stream.drain()
+
+
+def _expected_checksum(headers, checksum_type=None):
+    """Pick the checksum a download should be validated against from Artifactory's response headers.
+
+    :param headers:         Headers of the Artifactory response for the artifact
+    :type headers:          dict
+    :param checksum_type:   (Optional) Checksum type to use (md5, sha1 or sha256). Defaults to the strongest
+                            checksum present in the headers.
+    :type checksum_type:    str
+    :return:                The checksum type and the checksum Artifactory provided
+    :rtype:                 tuple(str, str)
+    :raises:                ArtifactoryRequestException
+    """
+    if checksum_type is None:
+        checksum_type = next((alg for alg, header in CHECKSUM_HEADERS.items() if header in headers), None)
+
+    if checksum_type not in CHECKSUM_HEADERS or CHECKSUM_HEADERS[checksum_type] not in headers:
+        raise ArtifactoryRequestException(f'Artifactory did not provide a {checksum_type or "checksum"} header to '
+                                          f'validate the download against')
+
+    return checksum_type, headers[CHECKSUM_HEADERS[checksum_type]]
+
+
+def _validate_checksum(checksum_type, provided_checksum, downloaded_checksum):
+    """Make sure a downloaded file's checksum matches the one Artifactory provided.
+
+    :param checksum_type:       Checksum type (md5, sha1 or sha256)
+    :type checksum_type:        str
+    :param provided_checksum:   Checksum provided by Artifactory
+    :type provided_checksum:    str
+    :param downloaded_checksum: Checksum of the downloaded file
+    :type downloaded_checksum:  str
+    :return:                    None
+    :rtype:                     None
+    :raises:                    ArtifactoryRequestException
+    """
+    if provided_checksum != downloaded_checksum:
+        raise ArtifactoryRequestException(f'Download failed! The downloaded file\'s {checksum_type} checksum '
+                                          f'({downloaded_checksum}) does not match what was provided by '
+                                          f'Artifactory ({provided_checksum})')
+
+
+class RetryPolicy:
+    """Retry settings and shared retry state for an Artifactory client.
+
+    Failed requests are retried with exponential backoff and full jitter, or after the delay the server asks for in
+    a `Retry-After` header. To keep retries from piling onto an overloaded server, every retry spends a token from
+    a budget that is shared by all requests of the client and slowly refilled by successful requests; once it is
+    empty, failures are raised straight away. If `breaker_threshold` requests in a row fail, the circuit breaker
+    opens and requests fail fast for `breaker_cooldown` seconds before one is let through to probe the server.
+    Connection errors and 5xx responses count as failures; 4xx responses count as neither a success nor a failure.
+    """
+
+    def __init__(self, max_retries=5, backoff_factor=0.5, max_backoff=60, retry_budget=20, budget_refill=0.1,
+                 breaker_threshold=10, breaker_cooldown=30):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_budget = retry_budget
+        self.budget_refill = budget_refill
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+
+        self._lock = threading.Lock()
+        self._tokens = retry_budget
+        self._consecutive_failures = 0
+        self._open_until = 0
+
+    def check_circuit(self):
+        """Fail fast while the circuit breaker is open.
+
+        :return:    None
+        :rtype:     None
+        :raises:    ArtifactoryRequestException
+        """
+        with self._lock:
+            remaining = self._open_until - time.monotonic()
+
+        if remaining > 0:
+            raise ArtifactoryRequestException(f'Too many consecutive request failures; not sending requests to '
+                                              f'Artifactory for another {remaining:.0f} seconds')
+
+    def record_success(self):
+        """Close the circuit breaker and refill the retry budget after a successful request"""
+        with self._lock:
+            self._consecutive_failures = 0
+            self._tokens = min(self.retry_budget, self._tokens + self.budget_refill)
+
+    def record_failure(self):
+        """Count a failed request, opening the circuit breaker if too many failed in a row"""
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.breaker_threshold:
+                logging.error(f'{self._consecutive_failures} consecutive request failures; pausing requests for '
+                              f'{self.breaker_cooldown} seconds')
+                self._open_until = time.monotonic() + self.breaker_cooldown
+                self._consecutive_failures = 0
+
+    def acquire_retry(self, attempt):
+        """Check whether a request may be retried, spending a token from the retry budget if so.
+
+        :param attempt: Number of retries already made for the request
+        :type attempt:  int
+        :return:        True if the request should be retried
+        :rtype:         bool
+        """
+        if attempt >= self.max_retries:
+            return False
+
+        with self._lock:
+            if self._tokens < 1:
+                logging.warning('Retry budget exhausted; not retrying the request')
+                return False
+            self._tokens -= 1
+
+        return True
+
+    def delay(self, attempt, retry_after=None):
+        """Work out how long to wait before retrying a request.
+
+        :param attempt:     Number of retries already made for the request
+        :type attempt:      int
+        :param retry_after: (Optional) Value of the `Retry-After` response header, in seconds or as an HTTP date
+        :type retry_after:  str
+        :return:            Number of seconds to wait
+        :rtype:             float
+        """
+        if retry_after:
+            try:
+                return min(self.max_backoff, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    return min(self.max_backoff, max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()))
+                except (TypeError, ValueError):
+                    pass
+
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+
+class ArtifactoryBase:  # pylint: disable=too-few-public-methods
+    """Settings and request preparation shared by the Artifactory clients"""
     storage_api = '/api/storage'
     aql_api = '/api/search/aql'
 
@@ -42,8 +281,6 @@ class Artifactory:
         if not self.api_token:
             logging.warning('NO ARTIFACTORY API KEY WAS PROVIDED! SOME REQUESTS MAY FAIL!')
 
-        self.session = requests.session()
-
     def _cleanup_url(self, url):
         """Cleans up the URL string before the request is processed.
 
@@ -68,19 +305,17 @@ class Artifactory:
 
         return url
 
-    def _request_wrapper(self, request_type, uri, **request_headers):
-        """Wrapper around making HTTP requests.
+    def _prepare_request(self, request_headers):
+        """Split the keyword arguments of a request into headers and request options.
 
-        Abstracts making HTTP requests so that the requests are made in a consistent manner and other code
-        in this library is more DRY.
+        Adds the API token header, removes the `data` and `stream` entries (which are options for the request
+        rather than headers), drops headers without a value (e.g., the API token when none is set) and converts any
+        other non-string header values to strings.
 
-        :param request_type:    Type of HTTP request (e.g., GET, POST, PUT, etc)
-        :type request_type:     str
-        :param uri:             URI where to make the request. The base Artifactory URL will be added.
-        :type uri:              str
         :param request_headers: Additional headers that should be tacked onto the request.
-        :return:                HTTP response object
-        :rtype:                 requests.models.Response
+        :type request_headers:  dict
+        :return:                The headers, the request body (or None) and the stream flag
+        :rtype:                 tuple(dict, object, bool)
         """
         headers = {
             'X-JFrog-Art-Api': self.api_token
@@ -93,24 +328,199 @@ class Artifactory:
         # If the data key is present, then remove it from the dictionary object
         file_data = headers.pop('data', None)
 
+        # The stream flag is an option for the request itself rather than a header
+        stream = headers.pop('stream', False)
+
+        # requests ignores headers set to None but aiohttp can't send them, so drop them for both clients
+        headers = {key: value for key, value in headers.items() if value is not None}
+
         # Check for any non-string values in the headers dict
         for key, value in headers.items():
             if isinstance(value, (bool, int, float)):
                 headers[key] = str(value)
 
-        url = self._cleanup_url(uri)
+        return headers, file_data, stream
 
-        logging.debug(f'Making a {request_type.upper()} request to {url}')
+
+class Artifactory(ArtifactoryBase):  # pylint: disable=too-many-public-methods
+    """Abstracts interactions with Artifactory"""
+
+    def __init__(self, artifactory_url=DEFAULT_ARTIFACTORY_URL, api_token=None, max_workers=DEFAULT_MAX_WORKERS, cache=None,
+                 retry_policy=None, max_bandwidth=None, checksum_cache=None):
+        super().__init__(artifactory_url, api_token)
+
+        self.max_workers = max_workers
+
+        # Optional cap, in bytes per second, on the combined throughput of all transfers made by this client
+        self.bandwidth_limiter = BandwidthLimiter(max_bandwidth) if max_bandwidth else None
+
+        # Running totals across every transfer made by this client
+        self.transfer_totals = {'downloads': 0, 'uploads': 0, 'bytes_downloaded': 0, 'bytes_uploaded': 0, 'retries': 0}
+        self._totals_lock = threading.Lock()
+
+        # Shared by every request made through this client; pass RetryPolicy(max_retries=0) to disable retries
+        self.retry_policy = retry_policy or RetryPolicy()
+
+        # Optional ArtifactCache used by retrieve_file
+        self.cache = cache
+
+        # Optional ChecksumCache used when hashing local files before they are uploaded or synced
+        self.checksum_cache = checksum_cache
+
+        self.session = requests.session()
+
+        # The default adapter only keeps 10 connections per host around, so size the pool to the number of workers
+        # to keep batch transfers from opening and discarding connections
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _request_wrapper(self, request_type, uri, retry=None, **request_headers):  # pylint: disable=too-many-locals
+        """Wrapper around making HTTP requests.
+
+        Abstracts making HTTP requests so that the requests are made in a consistent manner and other code
+        in this library is more DRY.
+
+        Connection errors and overload responses (429, 502, 503 and 504) are retried according to the client's
+        `retry_policy`. Only idempotent methods are retried unless `retry=True` is passed, and requests whose body
+        can't be rewound (e.g., a generator) are never retried. File bodies are seeked back to where they started
+        before each retry.
+
+        :param request_type:    Type of HTTP request (e.g., GET, POST, PUT, etc)
+        :type request_type:     str
+        :param uri:             URI where to make the request. The base Artifactory URL will be added.
+        :type uri:              str
+        :param retry:           (Optional) Set this to `True` to retry a non-idempotent request (e.g., a read-only
+                                POST) or `False` to never retry the request.
+        :type retry:            bool
+        :param request_headers: Additional headers that should be tacked onto the request.
+        :return:                HTTP response object
+        :rtype:                 requests.models.Response
+        """
+        headers, file_data, stream = self._prepare_request(request_headers)
+
+        url = self._cleanup_url(uri)
 
         request_obj = getattr(self.session, request_type.lower())
 
-        response_obj = request_obj(url, data=file_data, headers=headers, verify=False)
+        if retry is None:
+            retry = request_type.upper() in IDEMPOTENT_METHODS
+
+        # Remember where a file body starts so it can be sent again
+        start_position = None
+        if hasattr(file_data, 'seek') and hasattr(file_data, 'tell'):
+            start_position = file_data.tell()
+        elif file_data is not None and not isinstance(file_data, (bytes, str, dict)):
+            retry = False
+
+        attempt = 0
+
+        while True:
+            self.retry_policy.check_circuit()
+
+            logging.debug(f'Making a {request_type.upper()} request to {url}')
+
+            retry_after = None
+
+            try:
+                response_obj = request_obj(url, data=file_data, headers=headers, stream=stream, verify=False)
+            except (requests.ConnectionError, requests.Timeout) as err:
+                self.retry_policy.record_failure()
+                if not (retry and self.retry_policy.acquire_retry(attempt)):
+                    raise
+                logging.warning(f'{request_type.upper()} request to {url} failed ({err})')
+            else:
+                if response_obj.status_code not in RETRY_STATUS_CODES:
+                    break
+
+                self.retry_policy.record_failure()
+                if not (retry and self.retry_policy.acquire_retry(attempt)):
+                    break
+
+                logging.warning(f'{request_type.upper()} request to {url} returned HTTP {response_obj.status_code}')
+                retry_after = response_obj.headers.get('Retry-After')
+                response_obj.close()
+
+            delay = self.retry_policy.delay(attempt, retry_after)
+            attempt += 1
+            logging.info(f'Retrying in {delay:.1f} seconds (retry {attempt}/{self.retry_policy.max_retries})')
+            time.sleep(delay)
+
+            if start_position is not None:
+                file_data.seek(start_position)
+
+        # Client errors say nothing about the health of the server, and retryable statuses were counted above
+        if response_obj.status_code < 400:
+            self.retry_policy.record_success()
+        elif response_obj.status_code >= 500 and response_obj.status_code not in RETRY_STATUS_CODES:
+            self.retry_policy.record_failure()
 
         if not str(response_obj.status_code).startswith('2'):
             response_obj.raise_for_status()
 
+        # Lets transfers report how many retries they needed
+        response_obj.retries = attempt
+
         return response_obj
 
+    def _finish_transfer(self, stats):
+        """Record a finished transfer in the client's totals and log its throughput.
+
+        :param stats:   Counters of the transfer
+        :type stats:    pythonlib.transfer.TransferStats
+        :return:        None
+        :rtype:         None
+        """
+        stats.finish()
+
+        with self._totals_lock:
+            self.transfer_totals[f'{stats.direction}s'] += 1
+            self.transfer_totals[f'bytes_{stats.direction}ed'] += stats.bytes_transferred
+            self.transfer_totals['retries'] += stats.retries
+
+        logging.info(str(stats))
+
+    def _run_concurrently(self, func, items, max_workers=None):
+        """Run a function over a set of items on a bounded worker pool.
+
+        Each item is a `(key, args)` tuple where `args` is the tuple of arguments passed to `func`. The items can be
+        any iterable, including a generator; only a small window of items is held in memory at once so very large
+        batches can be streamed through. Errors raised by `func` are collected instead of aborting the batch.
+
+        :param func:        Callable to run for each item
+        :type func:         callable
+        :param items:       Iterable of `(key, args)` tuples
+        :type items:        iterable
+        :param max_workers: (Optional) Number of concurrent workers. Defaults to the client's `max_workers`.
+        :type max_workers:  int
+        :return:            Report with a `succeeded` dict of key -> return value and a `failed` dict of
+                            key -> exception
+        :rtype:             dict
+        """
+        max_workers = max_workers or self.max_workers
+        report = {'succeeded': {}, 'failed': {}}
+
+        def collect(done_futures):
+            for future in done_futures:
+                key = in_flight.pop(future)
+                try:
+                    report['succeeded'][key] = future.result()
+                except Exception as err:  # pylint: disable=broad-except
+                    logging.error(f'{key} failed: {err}')
+                    report['failed'][key] = err
+
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for key, args in items:
+                if len(in_flight) >= max_workers * 2:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight[executor.submit(func, *args)] = key
+            collect(wait(in_flight).done)
+
+        logging.info(f'{len(report["succeeded"])} succeeded, {len(report["failed"])} failed')
+        return report
+
     # HTTP abstraction methods
     def get(self, uri, **request_headers):
         """Wrapper around HTTP GET.
@@ -164,6 +574,19 @@ class Artifactory:
         """
         return self._request_wrapper('delete', uri, **request_headers)
 
+    def head(self, uri, **request_headers):
+        """Wrapper around HTTP HEAD.
+
+        Abstraction of calling session.head().
+
+        :param uri:             URI of the HTTP request
+        :type uri:              str
+        :param request_headers: Optional additional headers to pass with the HTTP request.
+        :return:                HTTP response object
+        :rtype:                 requests.models.Response
+        """
+        return self._request_wrapper('head', uri, **request_headers)
+
     def file_exists(self, repository_name, file_name, return_extra_data=False):
         """Check that a file exists in Artifactory.
 
@@ -205,7 +628,8 @@ class Artifactory:
                                     headers from the Artifactory HTTP response.
         :type return_extra_data:    bool
         :return:                    True if the file exists and False if it does not, or a dict object containing the
-                                    headers from the Artifactory HTTP response.
+                                    headers from the Artifactory HTTP response. False is returned for a missing file
+                                    even when `return_extra_data=True`.
         :rtype:                     bool or dict
         """
         logging.info(f'Checking for the existence of {file_name}')
@@ -213,20 +637,77 @@ class Artifactory:
         url_path = os.path.join(self.storage_api, repository_name, file_name)
         logging.debug(f'url_path: {url_path}')
 
-        response = self.get(url_path)
+        try:
+            response = self.get(url_path)
+        except requests.HTTPError as err:
+            if err.response is not None and err.response.status_code == 404:
+                return False
+            raise
 
         if return_extra_data:
             return json.loads(response.text)
 
         return response.status_code == 200
 
-    def retrieve_file(self, repository_name, file_name, local_file=None, return_extra_data=False):
+    def _save_response(self, response, local_file, checksum_type=None, stats=None):
+        """Stream a download response to disk, validating it against Artifactory's checksum header.
+
+        The body is hashed as each chunk arrives so the file never has to be read back from disk. Data is written
+        to a temporary file next to `local_file` that is only renamed into place once the checksum matches, so a
+        failed or corrupt download never replaces an existing file.
+
+        :param response:        Streaming HTTP response for the artifact
+        :type response:         requests.models.Response
+        :param local_file:      Absolute path where the file should be saved
+        :type local_file:       str
+        :param checksum_type:   (Optional) Checksum to validate against (md5, sha1 or sha256). Defaults to the
+                                strongest checksum Artifactory provided.
+        :type checksum_type:    str
+        :param stats:           (Optional) Counters updated as the data arrives
+        :type stats:            pythonlib.transfer.TransferStats
+        :return:                Checksum of the downloaded file
+        :rtype:                 str
+        :raises:                ArtifactoryRequestException
+        """
+        checksum_type, provided_checksum = _expected_checksum(response.headers, checksum_type)
+        hash_obj = hashlib.new(checksum_type)
+        temp_file = f'{local_file}.{uuid.uuid4().hex[:8]}.part'
+
+        try:
+            with open(temp_file, 'xb') as handle:
+                for chunk in response.iter_content(chunk_size=TRANSFER_CHUNK_SIZE):
+                    if chunk:
+                        hash_obj.update(chunk)
+                        handle.write(chunk)
+                        if self.bandwidth_limiter:
+                            self.bandwidth_limiter.consume(len(chunk))
+                        if stats:
+                            stats.add(len(chunk))
+
+            logging.info('Validating downloaded file...')
+            downloaded_checksum = hash_obj.hexdigest()
+
+            _validate_checksum(checksum_type, provided_checksum, downloaded_checksum)
+
+            os.replace(temp_file, local_file)
+        finally:
+            response.close()
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+        return downloaded_checksum
+
+    def retrieve_file(self, repository_name, file_name, local_file=None, return_extra_data=False, checksum_type=None,
+                      progress_callback=None):
         """Download a file from Artifactory.
 
         Downloads a file from Artifactory given the repository name, file name, and the local path where the
         file should be saved. If the local path (`local_file`) isn't provided then the remote filename is used
         and saved in the current working directory.
 
+        If the client was created with an `ArtifactCache`, the artifact's SHA-256 is looked up with the storage API
+        first and a cached copy is used when available; otherwise the downloaded file is added to the cache.
+
         :param repository_name:     Artifactory repository name (e.g., conit-file-local)
         :type: repository_name:     str
         :param file_name:           Name of the file to download. If the file is in a subdirectory in the repository
@@ -237,8 +718,16 @@ class Artifactory:
                                     directory. Paths provided can be relative but MUST end in the filename!
         :param return_extra_data:   (Optional) Set this to `True` if you want extra metadata returned in addition to
                                     the path where the file was saved. The extra metadata is the headers returned by
-                                    Artifactory when the file is successfully downloaded.
+                                    Artifactory when the file is successfully downloaded, or the storage API metadata
+                                    when the file is served from the cache.
         :type return_extra_data:    bool
+        :param checksum_type:       (Optional) Checksum used to validate the download (md5, sha1 or sha256). By
+                                    default the strongest checksum provided by Artifactory is used. When a cache is
+                                    configured SHA-256 is always used.
+        :type checksum_type:        str
+        :param progress_callback:   (Optional) Called with the transfer's `TransferStats` as data arrives and once
+                                    more when the download finishes
+        :type progress_callback:    callable
         :return:                    Location where the file was downloaded
         :rtype:                     str or tuple(str, dict)
         :raises:                    ArtifactoryRequestException
@@ -252,28 +741,37 @@ class Artifactory:
         else:
             local_file = os.path.abspath(local_file)
 
-        response = self.get(f'{repository_name}/{file_name}', stream=True)
+        sha256 = None
 
-        try:
-            provided_md5 = response.headers['X-Checksum-Md5']
+        if self.cache:
+            metadata = self.file_exists(repository_name, file_name, return_extra_data=True)
+            sha256 = metadata.get('checksums', {}).get('sha256') if metadata else None
 
-            with open(local_file, 'wb') as handle:
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        handle.write(chunk)
+            if sha256 and self.cache.fetch(sha256, local_file):
+                if return_extra_data:
+                    return local_file, metadata
+                return local_file
 
-            logging.info('Validating downloaded file...')
+            # Validate against the same checksum the cache is keyed by
+            checksum_type = 'sha256' if sha256 else checksum_type
 
-            downloaded_md5 = generate_checksum(local_file, 'md5')
+        response = self.get(f'{repository_name}/{file_name}', stream=True)
 
-            if provided_md5 != downloaded_md5:
-                raise ArtifactoryRequestException(f'Download failed! The downloaded file\'s checksum ({downloaded_md5}) does not match '
-                                                  f'what was provided by Artifactory ({provided_md5})')
+        stats = TransferStats(file_name, 'download', int(response.headers.get('Content-Length', 0)) or None,
+                              progress_callback)
+        stats.time_to_first_byte = response.elapsed.total_seconds()
+        stats.retries = response.retries
 
+        try:
+            downloaded_checksum = self._save_response(response, local_file, checksum_type, stats)
+
+            if sha256 and downloaded_checksum == sha256:
+                self.cache.store(sha256, local_file)
         except OSError as ose:
             logging.exception(ose)
             raise ArtifactoryRequestException(ose)
 
+        self._finish_transfer(stats)
         logging.info(f'File saved to {local_file}')
 
         if return_extra_data:
@@ -281,23 +779,211 @@ class Artifactory:
 
         return local_file
 
-    def upload_file(self, repository_name, file_name, local_file):
+    def retrieve_file_segmented(self, repository_name, file_name, local_file=None, segment_size=DEFAULT_SEGMENT_SIZE,  # pylint: disable=too-many-locals,too-many-statements
+                                max_workers=None, checksum_type=None, progress_callback=None):
+        """Download a large file from Artifactory as parallel, resumable byte ranges.
+
+        Splits the artifact into `segment_size` byte ranges that are fetched concurrently with HTTP Range requests
+        and written straight into a preallocated `<local_file>.part` file. Finished segments are recorded in a
+        `<local_file>.part.state` sidecar file, so if the download is interrupted calling this method again only
+        fetches the missing segments. Once every segment is present the file is validated against Artifactory's
+        checksum and renamed into place.
+
+        Files smaller than one segment, or servers that don't support ranges, fall back to `retrieve_file`.
+
+        :param repository_name:     Artifactory repository name (e.g., conit-file-local)
+        :type: repository_name:     str
+        :param file_name:           Name of the file to download, including any path in the repository
+        :type file_name:            str
+        :param local_file:          (Optional) Local filename and path to where the file should be saved. Defaults to
+                                    the remote filename in the current directory.
+        :type local_file:           str
+        :param segment_size:        (Optional) Size of each byte range, in bytes
+        :type segment_size:         int
+        :param max_workers:         (Optional) Number of concurrent segment downloads. Defaults to the client's
+                                    `max_workers`.
+        :type max_workers:          int
+        :param checksum_type:       (Optional) Checksum used to validate the download (md5, sha1 or sha256). By
+                                    default the strongest checksum provided by Artifactory is used.
+        :type checksum_type:        str
+        :param progress_callback:   (Optional) Called with the transfer's `TransferStats` as data arrives and once
+                                    more when the download finishes
+        :type progress_callback:    callable
+        :return:                    Location where the file was downloaded
+        :rtype:                     str
+        :raises:                    ArtifactoryRequestException
+        """
+        if not local_file:
+            local_file = os.path.join(os.getcwd(), file_name.split('/')[-1])
+        else:
+            local_file = os.path.abspath(local_file)
+
+        uri = f'{repository_name}/{file_name}'
+        headers = self.head(uri).headers
+        file_size = int(headers.get('Content-Length', 0))
+
+        if headers.get('Accept-Ranges') != 'bytes' or file_size <= segment_size:
+            logging.info('Segmented download not possible or not worthwhile; downloading in a single request')
+            return self.retrieve_file(repository_name, file_name, local_file, checksum_type=checksum_type,
+                                      progress_callback=progress_callback)
+
+        checksum_type, provided_checksum = _expected_checksum(headers, checksum_type)
+        part_file = f'{local_file}.part'
+        state_file = f'{part_file}.state'
+
+        state = {'size': file_size, 'checksum': provided_checksum, 'segment_size': segment_size, 'completed': []}
+
+        # Resume only if the previous attempt was for the exact same artifact and segment layout
+        try:
+            with open(state_file, 'r') as handle:
+                previous_state = json.load(handle)
+            if all(previous_state.get(key) == state[key] for key in ('size', 'checksum', 'segment_size')) and \
+                    os.path.getsize(part_file) == file_size:
+                state = previous_state
+                logging.info(f'Resuming download; {len(state["completed"])} segments already present')
+        except (OSError, ValueError):
+            pass
+
+        if not state['completed']:
+            with open(part_file, 'wb') as handle:
+                handle.truncate(file_size)
+
+        completed = set(state['completed'])
+        state_lock = threading.Lock()
+        stats = TransferStats(file_name, 'download', file_size, progress_callback)
+
+        def fetch_segment(index, start, end):
+            response = self.get(uri, stream=True, Range=f'bytes={start}-{end}')
+
+            if response.status_code != 206:
+                raise ArtifactoryRequestException(f'Expected a partial response for bytes {start}-{end}, '
+                                                  f'got HTTP {response.status_code}')
+
+            if stats.time_to_first_byte is None:
+                stats.time_to_first_byte = response.elapsed.total_seconds()
+
+            written = 0
+            with open(part_file, 'r+b') as handle:
+                handle.seek(start)
+                for chunk in response.iter_content(chunk_size=TRANSFER_CHUNK_SIZE):
+                    written += handle.write(chunk)
+                    if self.bandwidth_limiter:
+                        self.bandwidth_limiter.consume(len(chunk))
+                    stats.add(len(chunk))
+
+            if written != end - start + 1:
+                raise ArtifactoryRequestException(f'Segment {index} is incomplete ({written}/{end - start + 1} bytes)')
+
+            with state_lock:
+                stats.retries += response.retries
+                completed.add(index)
+                state['completed'] = sorted(completed)
+                with open(f'{state_file}.tmp', 'w') as handle:
+                    json.dump(state, handle)
+                os.replace(f'{state_file}.tmp', state_file)
+
+        segments = (
+            (index, (index, start, min(start + segment_size, file_size) - 1))
+            for index, start in enumerate(range(0, file_size, segment_size))
+            if index not in completed
+        )
+
+        logging.info(f'Downloading {uri} in {-(-file_size // segment_size)} segments of up to {segment_size} bytes')
+        report = self._run_concurrently(fetch_segment, segments, max_workers)
+
+        if report['failed']:
+            raise ArtifactoryRequestException(f'{len(report["failed"])} segments failed to download; run the download '
+                                              f'again to resume from {part_file}')
+
+        logging.info('Validating downloaded file...')
+        downloaded_checksum = generate_checksums(part_file, [checksum_type])[checksum_type]
+
+        try:
+            _validate_checksum(checksum_type, provided_checksum, downloaded_checksum)
+        except ArtifactoryRequestException:
+            os.remove(part_file)
+            os.remove(state_file)
+            raise
+
+        os.replace(part_file, local_file)
+        os.remove(state_file)
+
+        self._finish_transfer(stats)
+        logging.info(f'File saved to {local_file}')
+
+        return local_file
+
+    def _deploy(self, url_path, checksum_headers, handle, checksum_deploy=True, stats=None):
+        """Deploy a file to Artifactory, trying a checksum-only deploy first.
+
+        With `checksum_deploy=True` the file is first deployed by checksum alone, which succeeds without sending any
+        data when Artifactory already holds content with the same checksum. The body is only streamed when the
+        server reports the content is unknown.
+
+        :param url_path:            Repository and path where the file is deployed (e.g., repo/path/to/file.txt)
+        :type url_path:             str
+        :param checksum_headers:    The X-Checksum-* headers for the file
+        :type checksum_headers:     dict
+        :param handle:              Open binary file object positioned at the start of the content
+        :type handle:               file
+        :param checksum_deploy:     (Optional) Set this to `False` to always stream the body
+        :type checksum_deploy:      bool
+        :param stats:               (Optional) Counters updated as the body is sent
+        :type stats:                pythonlib.transfer.TransferStats
+        :return:                    The upload location and a dict with `checksum_deploy` (whether the checksum-only
+                                    deploy was used) and `bytes_sent` (number of body bytes sent)
+        :rtype:                     tuple(str, dict)
+        """
+        if checksum_deploy:
+            try:
+                response = self.put(url_path, **checksum_headers, **{'X-Checksum-Deploy': 'true'})
+                logging.info(f'Content already present in Artifactory; deployed {url_path} by checksum')
+                return response.headers['Location'], {'checksum_deploy': True, 'bytes_sent': 0}
+            except requests.HTTPError as err:
+                if err.response is None or err.response.status_code != 404:
+                    raise
+                logging.debug(f'Checksum deploy of {url_path} not possible; uploading the content')
+
+        start = handle.tell()
+        body = MeteredReader(handle, stats, self.bandwidth_limiter) if stats else handle
+        response = self.put(url_path, data=body, **checksum_headers)
+
+        if stats:
+            stats.retries = response.retries
+
+        return response.headers['Location'], {'checksum_deploy': False, 'bytes_sent': handle.tell() - start}
+
+    def upload_file(self, repository_name, file_name, local_file, checksum_deploy=True, return_extra_data=False,
+                    progress_callback=None):
         """Upload a local file to Artifactory.
 
         Uploads a local file to Artifactory. Does the work of calculating the file checksums and pushing the
         file to the requested repository. If you want the file to be uploaded to a specific path in the given
         repository then that path needs to be provided as part of the `file_name` parameter.
 
-        :param repository_name: Artifactory repository name (e.g., conit-file-local)
-        :type: repository_name: str
-        :param file_name:       Name and path of the file in the remote repository. For example, if uploading the
-                                file `blerg.txt` then this parameter could be `path/to/blerg.txt`. If just the file
-                                name is provided then the file will be uploaded to the root of the given repository.
-        :param local_file:      Path to the local file to be uploaded. The path can be relative to the current
-                                working directory. If no path is provided it is assumed to be the current working
-                                directory. The path MUST include the filename!
-        :return:                Full path to the remote file once the upload is complete.
-        :rtype:                 str
+        By default a checksum-only deploy is attempted first, so content Artifactory already has (e.g., a rebuilt
+        but identical artifact) is deployed without sending the file.
+
+        :param repository_name:     Artifactory repository name (e.g., conit-file-local)
+        :type: repository_name:     str
+        :param file_name:           Name and path of the file in the remote repository. For example, if uploading
+                                    the file `blerg.txt` then this parameter could be `path/to/blerg.txt`. If just the
+                                    file name is provided then the file will be uploaded to the root of the given
+                                    repository.
+        :param local_file:          Path to the local file to be uploaded. The path can be relative to the current
+                                    working directory. If no path is provided it is assumed to be the current working
+                                    directory. The path MUST include the filename!
+        :param checksum_deploy:     (Optional) Set this to `False` to skip the checksum-only deploy and always send
+                                    the file.
+        :type checksum_deploy:      bool
+        :param return_extra_data:   (Optional) Set this to `True` to also return a dict saying whether the checksum
+                                    deploy was used (`checksum_deploy`) and how many bytes were sent (`bytes_sent`).
+        :type return_extra_data:    bool
+        :param progress_callback:   (Optional) Called with the transfer's `TransferStats` as data is sent and once
+                                    more when the upload finishes
+        :type progress_callback:    callable
+        :return:                    Full path to the remote file once the upload is complete.
+        :rtype:                     str or tuple(str, dict)
         """
         local_file = os.path.abspath(local_file)
 
@@ -307,24 +993,628 @@ class Artifactory:
             raise OSError(f'The given file at {local_file} does not exist or is not accessible by the current user.')
 
         # Generate the checksums for the file
-        upload_headers = {
-            'X-Checksum-Md5': generate_checksum(local_file, 'md5'),
-            'X-Checksum-Sha1': generate_checksum(local_file, 'sha1'),
-            'X-Checksum-Sha256': generate_checksum(local_file, 'sha256')
-        }
+        checksums = generate_checksums(local_file, CHECKSUM_HEADERS, cache=self.checksum_cache)
+        upload_headers = {header: checksums[checksum_type] for checksum_type, header in CHECKSUM_HEADERS.items()}
 
         url_path = os.path.join(repository_name, file_name)
 
+        stats = TransferStats(file_name, 'upload', os.path.getsize(local_file), progress_callback)
+
         with open(local_file, 'rb') as handle:
-            upload_headers['data'] = handle
-            response = self.put(url_path, **upload_headers)
+            upload_location, extra_data = self._deploy(url_path, upload_headers, handle, checksum_deploy, stats)
+
+        self._finish_transfer(stats)
+
+        logging.info(f'File successfully uploaded to {upload_location}')
+
+        if return_extra_data:
+            return upload_location, extra_data
+
+        return upload_location
+
+    def upload_stream(self, repository_name, file_name, stream, checksum_deploy=True, return_extra_data=False,  # pylint: disable=too-many-locals
+                      progress_callback=None):
+        """Upload data from a file object or an iterable of bytes to Artifactory.
+
+        Useful for build outputs that are generated in memory or piped from another process, which would otherwise
+        have to be written to a file for `upload_file`. The data is read once, computing the MD5, SHA-1 and SHA-256
+        checksums as it goes, into a spool that stays in memory up to `SPOOL_MAX_MEMORY` bytes and moves to a
+        temporary file beyond that. The spool is then deployed just like `upload_file`, including the checksum-only
+        deploy attempt.
+
+        :param repository_name:     Artifactory repository name (e.g., conit-file-local)
+        :type: repository_name:     str
+        :param file_name:           Name and path of the file in the remote repository (e.g., path/to/blerg.tar)
+        :type file_name:            str
+        :param stream:              Readable binary file object (e.g., `process.stdout`) or an iterable of bytes
+        :type stream:               file or iterable
+        :param checksum_deploy:     (Optional) Set this to `False` to skip the checksum-only deploy and always send
+                                    the data.
+        :type checksum_deploy:      bool
+        :param return_extra_data:   (Optional) Set this to `True` to also return a dict saying whether the checksum
+                                    deploy was used (`checksum_deploy`) and how many bytes were sent (`bytes_sent`).
+        :type return_extra_data:    bool
+        :param progress_callback:   (Optional) Called with the transfer's `TransferStats` as data is sent and once
+                                    more when the upload finishes
+        :type progress_callback:    callable
+        :return:                    Full path to the remote file once the upload is complete.
+        :rtype:                     str or tuple(str, dict)
+        """
+        logging.info(f'Uploading stream to {repository_name}/{file_name}')
+
+        if hasattr(stream, 'read'):
+            chunks = iter(lambda: stream.read(TRANSFER_CHUNK_SIZE), b'')
+        else:
+            chunks = stream
+
+        hash_objs = {checksum_type: hashlib.new(checksum_type) for checksum_type in CHECKSUM_HEADERS}
+
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as spool:
+            for chunk in chunks:
+                for hash_obj in hash_objs.values():
+                    hash_obj.update(chunk)
+                spool.write(chunk)
 
-        upload_location = response.headers['Location']
+            size = spool.tell()
+            spool.seek(0)
 
+            upload_headers = {
+                header: hash_objs[checksum_type].hexdigest() for checksum_type, header in CHECKSUM_HEADERS.items()
+            }
+
+            url_path = os.path.join(repository_name, file_name)
+            stats = TransferStats(file_name, 'upload', size, progress_callback)
+
+            upload_location, extra_data = self._deploy(url_path, upload_headers, spool, checksum_deploy, stats)
+
+        self._finish_transfer(stats)
         logging.info(f'File successfully uploaded to {upload_location}')
 
+        if return_extra_data:
+            return upload_location, extra_data
+
         return upload_location
 
+    def upload_files(self, repository_name, files, max_workers=None, bundle=None):
+        """Upload many local files to Artifactory concurrently.
+
+        Runs `upload_file` for each entry on a bounded worker pool that shares the client's connection pool. A
+        failure uploading one file does not stop the others; every result and error is returned in the report.
+        Many small files are instead deployed together as one exploded archive, since per-request overhead would
+        dominate uploading them one by one.
+
+        :param repository_name: Artifactory repository name (e.g., conit-file-local)
+        :type: repository_name: str
+        :param files:           Mapping of remote file name (including any path in the repository) to the local
+                                file to upload, e.g. `{'path/to/blerg.txt': 'build/blerg.txt'}`
+        :type files:            dict
+        :param max_workers:     (Optional) Number of concurrent uploads. Defaults to the client's `max_workers`.
+        :type max_workers:      int
+        :param bundle:          (Optional) Set this to `True` to always deploy the files as one exploded archive (see
+                                `upload_archive`) or `False` to always upload them one by one. By default an archive
+                                is used when there are many small files.
+        :type bundle:           bool
+        :return:                Report with a `succeeded` dict of remote file name -> upload location and a `failed`
+                                dict of remote file name -> exception
+        :rtype:                 dict
+        """
+        if bundle is None:
+            # Missing files are left out here and reported as failed by whichever upload path is used
+            sizes = [os.path.getsize(local_file) for local_file in files.values() if os.path.isfile(local_file)]
+            bundle = len(sizes) >= BUNDLE_MIN_FILES and sum(sizes) / len(sizes) <= BUNDLE_MAX_AVERAGE_SIZE
+
+        if bundle and files:
+            return self.upload_archive(repository_name, files)
+
+        items = ((file_name, (repository_name, file_name, local_file)) for file_name, local_file in files.items())
+        return self._run_concurrently(self.upload_file, items, max_workers)
+
+    def upload_archive(self, repository_name, files):
+        """Upload many local files to Artifactory as a single exploded archive.
+
+        Streams the files into a zip archive as it is sent and deploys it with Artifactory's explode-archive option,
+        so the files end up at the same paths as they would with one `upload_file` call each. This turns one request
+        per file into a single request, which is much faster for many small files. The archive is never written to
+        disk or held in memory as a whole.
+
+        :param repository_name: Artifactory repository name (e.g., conit-file-local)
+        :type: repository_name: str
+        :param files:           Mapping of remote file name (including any path in the repository) to the local
+                                file to upload, e.g. `{'path/to/blerg.txt': 'build/blerg.txt'}`
+        :type files:            dict
+        :return:                Report with a `succeeded` dict of remote file name -> upload location and a `failed`
+                                dict of remote file name -> exception. Missing local files are reported as failed
+                                and left out of the archive. As the archive is deployed in one request, either every
+                                other file succeeds or every other file fails.
+        :rtype:                 dict
+        """
+        report = {'succeeded': {}, 'failed': {}}
+
+        local_files = {}
+        for file_name, local_file in files.items():
+            local_file = os.path.abspath(local_file)
+            if os.path.isfile(local_file):
+                local_files[file_name] = local_file
+            else:
+                error = f'The given file at {local_file} does not exist or is not accessible by the current user.'
+                logging.error(error)
+                report['failed'][file_name] = OSError(error)
+
+        if not local_files:
+            return report
+
+        remote_names = {file_name: file_name.strip('/') for file_name in local_files}
+        base_path = posixpath.commonpath([posixpath.dirname(name) for name in remote_names.values()])
+
+        archive_files = {
+            posixpath.relpath(remote_names[file_name], base_path or '.'): local_file
+            for file_name, local_file in local_files.items()
+        }
+
+        url_path = '/'.join(filter(None, (repository_name, base_path, f'upload-{uuid.uuid4().hex}.zip')))
+        logging.info(f'Uploading {len(local_files)} files as an exploded archive to {url_path}')
+
+        stats = TransferStats(url_path, 'upload')
+
+        try:
+            body = metered_chunks(_zip_chunks(archive_files), stats, self.bandwidth_limiter)
+            self.put(url_path, data=body, **{'X-Explode-Archive': 'true'})
+        except (requests.RequestException, OSError, ValueError) as err:
+            logging.error(f'Archive upload failed: {err}')
+            report['failed'].update(dict.fromkeys(local_files, err))
+            return report
+
+        self._finish_transfer(stats)
+
+        report['succeeded'] = {
+            file_name: self._cleanup_url(f'{repository_name}/{remote_name}') for file_name, remote_name in remote_names.items()
+        }
+        logging.info(f'{len(local_files)} files successfully uploaded')
+
+        return report
+
+    def retrieve_files(self, repository_name, files, max_workers=None):
+        """Download many files from Artifactory concurrently.
+
+        Runs `retrieve_file` for each entry on a bounded worker pool that shares the client's connection pool. A
+        failure downloading one file does not stop the others; every result and error is returned in the report.
+
+        :param repository_name: Artifactory repository name (e.g., conit-file-local)
+        :type: repository_name: str
+        :param files:           Either a list of remote file names, which are saved to the current directory, or a
+                                mapping of remote file name to the local path where it should be saved
+        :type files:            list or dict
+        :param max_workers:     (Optional) Number of concurrent downloads. Defaults to the client's `max_workers`.
+        :type max_workers:      int
+        :return:                Report with a `succeeded` dict of remote file name -> local file and a `failed` dict
+                                of remote file name -> exception
+        :rtype:                 dict
+        """
+        if not isinstance(files, dict):
+            files = dict.fromkeys(files)
+
+        items = ((file_name, (repository_name, file_name, local_file)) for file_name, local_file in files.items())
+        return self._run_concurrently(self.retrieve_file, items, max_workers)
+
+    def list_files(self, repository_name, remote_path=''):
+        """List every file under a path in an Artifactory repository.
+
+        Uses a single deep listing from the storage API. Here is a sample of an entry in the returned dict:
+
+        {
+            "path/to/file.txt": {
+                "uri": "/path/to/file.txt",
+                "size": 10850496,
+                "lastModified": "2018-04-02T21:23:13.000Z",
+                "folder": false,
+                "sha1": "12e68161e7c35136758d87e511fbb8107097a8fa",
+                "sha2": "11a6923c2a589b946598fe205c8f645e57f3f4ee153d3b7315b7e1993c1b2ad1"
+            }
+        }
+
+        :param repository_name: Artifactory repository name (e.g., conit-file-local)
+        :type: repository_name: str
+        :param remote_path:     (Optional) Path in the repository to list. Defaults to the root of the repository.
+        :type remote_path:      str
+        :return:                Dict of file path relative to `remote_path` -> file info. An empty dict is returned
+                                if the path does not exist.
+        :rtype:                 dict
+        """
+        url_path = os.path.join(self.storage_api, repository_name, remote_path.strip('/'))
+
+        try:
+            response = self.get(f'{url_path}?list&deep=1&listFolders=0')
+        except requests.HTTPError as err:
+            if err.response is not None and err.response.status_code == 404:
+                return {}
+            raise
+
+        return {entry['uri'].lstrip('/'): entry for entry in json.loads(response.text).get('files', [])}
+
+    def sync_directory(self, local_dir, repository_name, remote_prefix='', delete=False, max_workers=None):  # pylint: disable=too-many-locals
+        """Upload only the new and changed files in a local directory to Artifactory.
+
+        Lists the remote tree with one deep listing and compares it with the local directory. Files whose size
+        differs from the remote copy are uploaded without being hashed; files of the same size are only uploaded if
+        their SHA-1 differs. Hashing and uploading both run on the worker pool.
+
+        :param local_dir:       Local directory to sync
+        :type local_dir:        str
+        :param repository_name: Artifactory repository name (e.g., conit-file-local)
+        :type: repository_name: str
+        :param remote_prefix:   (Optional) Path in the repository the directory is synced to. Defaults to the root
+                                of the repository.
+        :type remote_prefix:    str
+        :param delete:          (Optional) Set this to `True` to delete remote files that no longer exist locally
+        :type delete:           bool
+        :param max_workers:     (Optional) Number of concurrent workers. Defaults to the client's `max_workers`.
+        :type max_workers:      int
+        :return:                Report with an `uploaded` dict of remote file name -> upload location, a `deleted`
+                                list and an `unchanged` list of remote file names, and a `failed` dict of remote file
+                                name -> exception
+        :rtype:                 dict
+        """
+        local_dir = os.path.abspath(local_dir)
+        remote_prefix = remote_prefix.strip('/')
+
+        if not os.path.isdir(local_dir):
+            raise OSError(f'The given directory at {local_dir} does not exist or is not accessible by the current user.')
+
+        remote_files = self.list_files(repository_name, remote_prefix)
+        logging.info(f'Found {len(remote_files)} files under {repository_name}/{remote_prefix}')
+
+        local_files = {}
+        for root, _, files in os.walk(local_dir):
+            for fle in files:
+                local_file = os.path.join(root, fle)
+                local_files[os.path.relpath(local_file, local_dir).replace(os.sep, '/')] = local_file
+
+        def is_changed(relative_path, local_file):
+            remote_file = remote_files.get(relative_path)
+            if remote_file is None or remote_file.get('size') != os.path.getsize(local_file):
+                return True
+            return remote_file.get('sha1') != generate_checksums(local_file, ['sha1'], cache=self.checksum_cache)['sha1']
+
+        comparison = self._run_concurrently(is_changed, ((path, (path, fle)) for path, fle in local_files.items()),
+                                            max_workers)
+
+        report = {'uploaded': {}, 'deleted': [], 'unchanged': [], 'failed': {}}
+        changed = {}
+
+        for relative_path, needs_upload in comparison['succeeded'].items():
+            remote_name = '/'.join(filter(None, (remote_prefix, relative_path)))
+            if needs_upload:
+                changed[remote_name] = local_files[relative_path]
+            else:
+                report['unchanged'].append(remote_name)
+
+        for relative_path, err in comparison['failed'].items():
+            report['failed']['/'.join(filter(None, (remote_prefix, relative_path)))] = err
+
+        logging.info(f'{len(changed)} of {len(local_files)} files are new or changed')
+
+        uploads = self.upload_files(repository_name, changed, max_workers)
+        report['uploaded'] = uploads['succeeded']
+        report['failed'].update(uploads['failed'])
+
+        if delete:
+            stale = ['/'.join(filter(None, (remote_prefix, path))) for path in remote_files if path not in local_files]
+            logging.info(f'Deleting {len(stale)} remote files that no longer exist locally')
+
+            # Remote names can contain characters such as #, ? and % that would otherwise break the URL
+            deletes = self._run_concurrently(
+                self.delete,
+                ((remote_name, (f'{repository_name}/{quote(remote_name, safe="/")}',)) for remote_name in stale),
+                max_workers
+            )
+            report['deleted'] = list(deletes['succeeded'])
+            report['failed'].update(deletes['failed'])
+
+        return report
+
+    def files_exist(self, files, batch_size=AQL_BATCH_SIZE):
+        """Check that many files exist in Artifactory and get their metadata.
+
+        Resolves the given files with a handful of AQL queries (one per `batch_size` files) instead of one storage
+        API request per file. Every requested file is present in the returned dict; files that don't exist map to
+        `None`. Here is a sample of the metadata returned for a file that exists:
+
+        {
+            "size": 10850496,
+            "created": "2018-04-02T21:23:22.626Z",
+            "modified": "2018-04-02T21:23:13.000Z",
+            "checksums": {
+              "md5": "7f5e10990994efbcc55c253c404112d0",
+              "sha1": "12e68161e7c35136758d87e511fbb8107097a8fa",
+              "sha256": "11a6923c2a589b946598fe205c8f645e57f3f4ee153d3b7315b7e1993c1b2ad1"
+            }
+        }
+
+        :param files:       Iterable of `(repository_name, file_name)` tuples, where the file name includes any path
+                            in the repository (e.g., `('conit-file-local', 'path/to/file.txt')`)
+        :type files:        iterable
+        :param batch_size:  (Optional) Number of files resolved by each AQL query
+        :type batch_size:   int
+        :return:            Dict of `(repository_name, file_name)` -> metadata dict, or `None` if the file is absent
+        :rtype:             dict
+        :raises:            ArtifactoryRequestException
+        """
+        result = {}
+        batch = []
+
+        def resolve(batch):
+            criteria = []
+            for repository_name, file_name in batch:
+                path, name = os.path.split(file_name.strip('/'))
+                criteria.append({'repo': repository_name, 'path': path or '.', 'name': name})
+                result[(repository_name, file_name)] = None
+
+            aql = (f'items.find({json.dumps({"$or": criteria})})'
+                   '.include("repo","path","name","size","created","modified","actual_md5","actual_sha1","sha256")')
+            response = self.aql_query(aql)
+
+            if response is None:
+                raise ArtifactoryRequestException('AQL query for the bulk file lookup failed')
+
+            found = {}
+            for item in response['results']:
+                file_name = item['name'] if item['path'] == '.' else f'{item["path"]}/{item["name"]}'
+                found[(item['repo'], file_name)] = {
+                    'size': item.get('size'),
+                    'created': item.get('created'),
+                    'modified': item.get('modified'),
+                    'checksums': {
+                        'md5': item.get('actual_md5'),
+                        'sha1': item.get('actual_sha1'),
+                        'sha256': item.get('sha256'),
+                    },
+                }
+
+            for repository_name, file_name in batch:
+                result[(repository_name, file_name)] = found.get((repository_name, file_name.strip('/')))
+
+        for entry in files:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                resolve(batch)
+                batch = []
+
+        if batch:
+            resolve(batch)
+
+        logging.info(f'{sum(1 for value in result.values() if value)}/{len(result)} files exist in Artifactory')
+        return result
+
+    def _spool_aql_results(self, aql):
+        """Collect every result of an AQL query on disk before yielding them.
+
+        Needed when the results are modified while they are being processed (e.g., moved or deleted), since that
+        would shift the offsets `aql_query_iter` uses to fetch the later pages.
+
+        :param aql: The AQL string representing the query to run
+        :type aql:  str
+        :return:    Generator yielding each result of the query
+        :rtype:     generator
+        """
+        with tempfile.TemporaryFile('w+') as spool:
+            for item in self.aql_query_iter(aql):
+                spool.write(f'{json.dumps(item)}\n')
+            spool.seek(0)
+
+            for line in spool:
+                yield json.loads(line)
+
+    def _relocate_items(self, operation, items, target_repository, target_prefix='', dry_run=False, max_workers=None):
+        """Copy or move items between repositories on the Artifactory server.
+
+        :param operation:           Either `copy` or `move`
+        :type operation:            str
+        :param items:               AQL query selecting the items, or an iterable of item dicts with `repo`, `path`
+                                    and `name` keys (the format of AQL results)
+        :type items:                str or iterable
+        :param target_repository:   Repository the items are copied or moved to
+        :type target_repository:    str
+        :param target_prefix:       (Optional) Path prepended to each item's path in the target repository
+        :type target_prefix:        str
+        :param dry_run:             (Optional) Set this to `True` to only check that the operation would succeed
+        :type dry_run:              bool
+        :param max_workers:         (Optional) Number of concurrent requests. Defaults to the client's `max_workers`.
+        :type max_workers:          int
+        :return:                    Report with a `succeeded` dict of source path -> Artifactory's response messages
+                                    and a `failed` dict of source path -> exception
+        :rtype:                     dict
+        """
+        if isinstance(items, str):
+            if operation == 'move' and not dry_run:
+                items = self._spool_aql_results(items)
+            else:
+                items = self.aql_query_iter(items)
+
+        def relocate(source_path, target_path):
+            # Item names can contain characters such as #, ? and % that would otherwise break the URL
+            source_url = quote(source_path, safe='/')
+            target_url = quote(target_path, safe='/')
+            url_path = f'/api/{operation}/{source_url}?to=/{target_url}'
+            if dry_run:
+                url_path += '&dry=1'
+            return json.loads(self.post(url_path).text).get('messages', [])
+
+        def targets():
+            for item in items:
+                item_path = '' if item['path'] == '.' else item['path']
+                source_path = '/'.join(filter(None, (item['repo'], item_path, item['name'])))
+                target_path = '/'.join(filter(None, (target_repository, target_prefix.strip('/'), item_path, item['name'])))
+                yield source_path, (source_path, target_path)
+
+        logging.info(f'{"Dry run: " if dry_run else ""}Running server-side {operation} to {target_repository}')
+        return self._run_concurrently(relocate, targets(), max_workers)
+
+    def copy_items(self, items, target_repository, target_prefix='', dry_run=False, max_workers=None):
+        """Copy items to another repository without the data leaving the Artifactory server.
+
+        Useful for promoting a build from a staging repository to a release repository. Items keep their path
+        unless a `target_prefix` is given, e.g. copying `staging-local/app/1.0/app.jar` to `release-local` creates
+        `release-local/app/1.0/app.jar`.
+
+        :param items:               AQL query selecting the items, e.g.
+                                    `items.find({"repo": "staging-local", "path": {"$match": "app/1.0*"}})`, or an
+                                    iterable of item dicts with `repo`, `path` and `name` keys
+        :type items:                str or iterable
+        :param target_repository:   Repository the items are copied to
+        :type target_repository:    str
+        :param target_prefix:       (Optional) Path prepended to each item's path in the target repository
+        :type target_prefix:        str
+        :param dry_run:             (Optional) Set this to `True` to only check that the copy would succeed
+        :type dry_run:              bool
+        :param max_workers:         (Optional) Number of concurrent requests. Defaults to the client's `max_workers`.
+        :type max_workers:          int
+        :return:                    Report with a `succeeded` dict of source path -> Artifactory's response messages
+                                    and a `failed` dict of source path -> exception
+        :rtype:                     dict
+        """
+        return self._relocate_items('copy', items, target_repository, target_prefix, dry_run, max_workers)
+
+    def move_items(self, items, target_repository, target_prefix='', dry_run=False, max_workers=None):
+        """Move items to another repository without the data leaving the Artifactory server.
+
+        Works like `copy_items`, except the items are removed from their source repository.
+
+        :param items:               AQL query selecting the items, or an iterable of item dicts with `repo`, `path`
+                                    and `name` keys
+        :type items:                str or iterable
+        :param target_repository:   Repository the items are moved to
+        :type target_repository:    str
+        :param target_prefix:       (Optional) Path prepended to each item's path in the target repository
+        :type target_prefix:        str
+        :param dry_run:             (Optional) Set this to `True` to only check that the move would succeed
+        :type dry_run:              bool
+        :param max_workers:         (Optional) Number of concurrent requests. Defaults to the client's `max_workers`.
+        :type max_workers:          int
+        :return:                    Report with a `succeeded` dict of source path -> Artifactory's response messages
+                                    and a `failed` dict of source path -> exception
+        :rtype:                     dict
+        """
+        return self._relocate_items('move', items, target_repository, target_prefix, dry_run, max_workers)
+
+    def prune(self, repository_name, path_prefix='', keep_last=None, older_than_days=None, never_downloaded=False,  # pylint: disable=too-many-locals
+              dry_run=False, journal_file=None, max_workers=None, max_deletes_per_second=None):
+        """Delete files from a repository according to retention rules.
+
+        Candidates are streamed from AQL, so memory use does not grow with the size of the repository. A file is
+        only deleted if it matches every rule given:
+
+            - `older_than_days`: the file was created more than this many days ago
+            - `never_downloaded`: the file has never been downloaded
+            - `keep_last`: the file is not one of the `keep_last` newest files in its folder. The newest files are
+              picked from the files that match the other rules, so combining rules only ever keeps more files.
+
+        Deletes run concurrently and can be rate limited. Each deleted path is appended to `journal_file`; paths
+        already in the journal are skipped, so an interrupted run can simply be started again.
+
+        :param repository_name:         Artifactory repository name (e.g., conit-file-local)
+        :type: repository_name:         str
+        :param path_prefix:             (Optional) Only consider files in this folder of the repository, including its
+                                        sub-folders
+        :type path_prefix:              str
+        :param keep_last:               (Optional) Number of newest files to keep in each folder
+        :type keep_last:                int
+        :param older_than_days:         (Optional) Only delete files created more than this many days ago
+        :type older_than_days:          int
+        :param never_downloaded:        (Optional) Set this to `True` to only delete files that were never downloaded
+        :type never_downloaded:         bool
+        :param dry_run:                 (Optional) Set this to `True` to only report what would be deleted
+        :type dry_run:                  bool
+        :param journal_file:            (Optional) File recording every deleted path, used to resume a run
+        :type journal_file:             str
+        :param max_workers:             (Optional) Number of concurrent deletes. Defaults to the client's
+                                        `max_workers`.
+        :type max_workers:              int
+        :param max_deletes_per_second:  (Optional) Cap on the rate of delete requests
+        :type max_deletes_per_second:   float
+        :return:                        Report with the number of files `deleted` (or that would be deleted in a dry
+                                        run), the `bytes_reclaimed`, the number of files `skipped` because they are
+                                        in the journal and a `failed` dict of path -> exception
+        :rtype:                         dict
+        """
+        criteria = {'repo': repository_name, 'type': 'file'}
+
+        prefix = path_prefix.strip('/')
+        if prefix:
+            # Match the folder itself and anything under it, but not sibling folders that share the prefix
+            criteria['$or'] = [{'path': prefix}, {'path': {'$match': f'{prefix}/*'}}]
+        if older_than_days is not None:
+            criteria['created'] = {'$before': f'{older_than_days}d'}
+        if never_downloaded:
+            criteria['stat.downloads'] = {'$eq': None}
+
+        # Sorting by folder keeps the files of a folder together, newest first, for the keep_last rule
+        aql = (f'items.find({json.dumps(criteria)}).include("repo","path","name","size","created")'
+               '.sort({"$desc": ["path", "created"]})')
+
+        journaled = set()
+        if journal_file and os.path.exists(journal_file):
+            with open(journal_file, 'r') as handle:
+                journaled = {line.strip() for line in handle if line.strip()}
+            logging.info(f'Resuming prune; {len(journaled)} files were already deleted')
+
+        report = {'deleted': 0, 'bytes_reclaimed': 0, 'skipped': 0, 'failed': {}}
+
+        def candidates(items):
+            folder, position = None, 0
+
+            for item in items:
+                if item['path'] != folder:
+                    folder, position = item['path'], 0
+                position += 1
+
+                if keep_last and position <= keep_last:
+                    continue
+
+                item_path = '/'.join(filter(None, (item['repo'], '' if item['path'] == '.' else item['path'], item['name'])))
+
+                if item_path in journaled:
+                    report['skipped'] += 1
+                    continue
+
+                yield item_path, (item_path, item.get('size', 0))
+
+        if dry_run:
+            for item_path, (_, size) in candidates(self.aql_query_iter(aql)):
+                logging.info(f'Dry run: would delete {item_path}')
+                report['deleted'] += 1
+                report['bytes_reclaimed'] += size
+
+            logging.info(f'Dry run: {report["deleted"]} files ({report["bytes_reclaimed"]} bytes) would be deleted')
+            return report
+
+        # One token per delete request
+        limiter = BandwidthLimiter(max_deletes_per_second) if max_deletes_per_second else None
+        journal_lock = threading.Lock()
+
+        with open(journal_file, 'a') if journal_file else nullcontext() as journal:
+            def delete_item(item_path, size):
+                if limiter:
+                    limiter.consume(1)
+
+                # Item names can contain characters such as #, ? and % that would otherwise break the URL
+                self.delete(quote(item_path, safe='/'))
+
+                if journal:
+                    with journal_lock:
+                        journal.write(f'{item_path}\n')
+                        journal.flush()
+
+                return size
+
+            result = self._run_concurrently(delete_item, candidates(self._spool_aql_results(aql)), max_workers)
+
+        report['deleted'] = len(result['succeeded'])
+        report['bytes_reclaimed'] = sum(result['succeeded'].values())
+        report['failed'] = result['failed']
+
+        logging.info(f'Deleted {report["deleted"]} files and reclaimed {report["bytes_reclaimed"]} bytes')
+        return report
+
     def aql_query(self, aql, encoding='UTF-8'):
         """
         Executes an arbitrary AQL query against the Artifactory AQL API
@@ -337,8 +1627,52 @@ class Artifactory:
         :rtype:             json
         """
         try:
-            response = self.post(self.aql_api, data=aql)
+            response = self.post(self.aql_api, data=aql, retry=True)
             result = json.loads(response.content.decode(encoding))
             return result
         except Exception as err:  # pylint: disable=broad-except
             logging.exception(err)
+
+    def aql_query_iter(self, aql, page_size=AQL_PAGE_SIZE, encoding='UTF-8'):
+        """Iterate over the results of an AQL query one page at a time.
+
+        Appends `.offset()` and `.limit()` to the query and requests one page of `page_size` results at a time,
+        yielding each result as it goes. Memory use therefore depends on the page size rather than the size of the
+        whole result set, and each request stays small enough to avoid server timeouts. Unlike `aql_query`, errors
+        are raised instead of being logged and swallowed.
+
+        Add a `.sort()` to the query so the pages are cut from a stable ordering, e.g.
+        `items.find({"repo": "conit-file-local"}).sort({"$asc": ["path", "name"]})`.
+
+        :param aql:         The AQL string representing the query to run. It must not contain `.offset()` or
+                            `.limit()` already.
+        :type aql:          str
+        :param page_size:   (Optional) Number of results fetched per request
+        :type page_size:    int
+        :param encoding:    The encoding used to decode the response
+        :type encoding:     str
+        :return:            Generator yielding each result of the query
+        :rtype:             generator
+        :raises:            ArtifactoryRequestException
+        """
+        if '.offset(' in aql or '.limit(' in aql:
+            raise ValueError('The AQL query passed to aql_query_iter must not contain .offset() or .limit()')
+
+        offset = 0
+
+        while True:
+            page_aql = f'{aql}.offset({offset}).limit({page_size})'
+            logging.debug(f'Running AQL page: {page_aql}')
+
+            try:
+                response = self.post(self.aql_api, data=page_aql, retry=True)
+                results = json.loads(response.content.decode(encoding))['results']
+            except (requests.RequestException, ValueError, KeyError) as err:
+                raise ArtifactoryRequestException(f'AQL query failed at offset {offset}: {err}') from err
+
+            yield from results
+
+            if len(results) < page_size:
+                return
+
+            offset += page_size
@@ -0,0 +1,359 @@
+"""
+Module for abstracting interactions with Artifactory from asyncio applications
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+
+import aiohttp
+
+from .artifactory import (CHECKSUM_HEADERS, DEFAULT_ARTIFACTORY_URL, TRANSFER_CHUNK_SIZE, ArtifactoryBase, ArtifactoryRequestException,
+                          _expected_checksum, _validate_checksum)
+from .checksum import generate_checksums
+
+
+# Maximum number of requests in flight at once; further requests wait for a free connection
+DEFAULT_MAX_CONCURRENCY = 64
+
+
+class AsyncArtifactory(ArtifactoryBase):
+    """Abstracts interactions with Artifactory for asyncio applications.
+
+    Mirrors the blocking `Artifactory` client, but every request method is a coroutine so a single event loop can
+    drive thousands of artifact operations at once. Requests share a pooled connection limited to `max_concurrency`
+    connections, and downloads and uploads are streamed rather than held in memory.
+
+    The client should be closed when it is no longer needed, either by calling `close()` or by using it as an async
+    context manager:
+
+        async with AsyncArtifactory(url) as artifactory:
+            await artifactory.retrieve_file('conit-file-local', 'path/to/file.txt')
+    """
+
+    def __init__(self, artifactory_url=DEFAULT_ARTIFACTORY_URL, api_token=None, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        super().__init__(artifactory_url, api_token)
+
+        self.max_concurrency = max_concurrency
+
+        # The session and semaphore are created on first use so they belong to the running event loop
+        self.session = None
+        self._transfer_slots = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the HTTP session and its connections.
+
+        :return:    None
+        :rtype:     None
+        """
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    def _get_session(self):
+        """Get the HTTP session, creating it if needed.
+
+        :return:    HTTP session
+        :rtype:     aiohttp.ClientSession
+        """
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, ssl=False)
+            self.session = aiohttp.ClientSession(connector=connector)
+
+            # Bounds the number of files open for transfers, which would otherwise grow with the number of
+            # operations waiting for a connection
+            self._transfer_slots = asyncio.Semaphore(self.max_concurrency)
+
+        return self.session
+
+    async def _request_wrapper(self, request_type, uri, **request_headers):
+        """Wrapper around making HTTP requests.
+
+        Abstracts making HTTP requests so that the requests are made in a consistent manner and other code
+        in this library is more DRY. Unless `stream=True` is passed the response body is read before the response
+        is returned, so the connection is released back to the pool straight away. A streamed response must be
+        released by the caller.
+
+        :param request_type:    Type of HTTP request (e.g., GET, POST, PUT, etc)
+        :type request_type:     str
+        :param uri:             URI where to make the request. The base Artifactory URL will be added.
+        :type uri:              str
+        :param request_headers: Additional headers that should be tacked onto the request.
+        :return:                HTTP response object
+        :rtype:                 aiohttp.ClientResponse
+        """
+        headers, file_data, stream = self._prepare_request(request_headers)
+
+        url = self._cleanup_url(uri)
+
+        logging.debug(f'Making a {request_type.upper()} request to {url}')
+
+        response_obj = await self._get_session().request(request_type.upper(), url, data=file_data, headers=headers)
+
+        try:
+            if not stream:
+                await response_obj.read()
+            response_obj.raise_for_status()
+        except Exception:
+            response_obj.release()
+            raise
+
+        return response_obj
+
+    # HTTP abstraction methods
+    async def get(self, uri, **request_headers):
+        """Wrapper around HTTP GET.
+
+        :param uri:             URI of the HTTP request
+        :type uri:              str
+        :param request_headers: Optional additional headers to pass with the HTTP request.
+        :return:                HTTP response object
+        :rtype:                 aiohttp.ClientResponse
+        """
+        return await self._request_wrapper('get', uri, **request_headers)
+
+    async def post(self, uri, **request_headers):
+        """Wrapper around HTTP POST.
+
+        :param uri:             URI of the HTTP request
+        :type uri:              str
+        :param request_headers: Optional additional headers to pass with the HTTP request.
+        :return:                HTTP response object
+        :rtype:                 aiohttp.ClientResponse
+        """
+        return await self._request_wrapper('post', uri, **request_headers)
+
+    async def put(self, uri, **request_headers):
+        """Wrapper around HTTP PUT.
+
+        :param uri:             URI of the HTTP request
+        :type uri:              str
+        :param request_headers: Optional additional headers to pass with the HTTP request.
+        :return:                HTTP response object
+        :rtype:                 aiohttp.ClientResponse
+        """
+        return await self._request_wrapper('put', uri, **request_headers)
+
+    async def delete(self, uri, **request_headers):
+        """Wrapper around HTTP DELETE.
+
+        :param uri:             URI of the HTTP request
+        :type uri:              str
+        :param request_headers: Optional additional headers to pass with the HTTP request.
+        :return:                HTTP response object
+        :rtype:                 aiohttp.ClientResponse
+        """
+        return await self._request_wrapper('delete', uri, **request_headers)
+
+    async def head(self, uri, **request_headers):
+        """Wrapper around HTTP HEAD.
+
+        :param uri:             URI of the HTTP request
+        :type uri:              str
+        :param request_headers: Optional additional headers to pass with the HTTP request.
+        :return:                HTTP response object
+        :rtype:                 aiohttp.ClientResponse
+        """
+        return await self._request_wrapper('head', uri, **request_headers)
+
+    async def file_exists(self, repository_name, file_name, return_extra_data=False):
+        """Check that a file exists in Artifactory.
+
+        See `Artifactory.file_exists` for a sample of the metadata returned with `return_extra_data=True`.
+
+        :param repository_name:     Artifactory repository name (e.g., conit-file-local)
+        :type: repository_name:     str
+        :param file_name:           Name of the file, including any path in the repository
+        :type file_name:            str
+        :param return_extra_data:   (Optional) Set this to `True` to get the storage API metadata of the file instead
+                                    of a boolean
+        :type return_extra_data:    bool
+        :return:                    True if the file exists and False if it does not, or a dict object containing the
+                                    metadata of the file. False is returned for a missing file even when
+                                    `return_extra_data=True`.
+        :rtype:                     bool or dict
+        """
+        logging.info(f'Checking for the existence of {file_name}')
+
+        url_path = os.path.join(self.storage_api, repository_name, file_name)
+
+        try:
+            response = await self.get(url_path)
+        except aiohttp.ClientResponseError as err:
+            if err.status == 404:
+                return False
+            raise
+
+        if return_extra_data:
+            return json.loads(await response.text())
+
+        return response.status == 200
+
+    async def retrieve_file(self, repository_name, file_name, local_file=None, return_extra_data=False, checksum_type=None):
+        """Download a file from Artifactory.
+
+        The file is streamed to a temporary file and hashed as it arrives, then renamed into place once its
+        checksum matches the one provided by Artifactory. Disk writes and hashing run in a worker thread so the event
+        loop is not blocked.
+
+        :param repository_name:     Artifactory repository name (e.g., conit-file-local)
+        :type: repository_name:     str
+        :param file_name:           Name of the file to download, including any path in the repository
+        :type file_name:            str
+        :param local_file:          (Optional) Local filename and path to where the file should be saved. Defaults to
+                                    the remote filename in the current directory.
+        :type local_file:           str
+        :param return_extra_data:   (Optional) Set this to `True` to also return the headers of the response
+        :type return_extra_data:    bool
+        :param checksum_type:       (Optional) Checksum used to validate the download (md5, sha1 or sha256). By
+                                    default the strongest checksum provided by Artifactory is used.
+        :type checksum_type:        str
+        :return:                    Location where the file was downloaded
+        :rtype:                     str or tuple(str, dict)
+        :raises:                    ArtifactoryRequestException
+        """
+        logging.info(f'Downloading file from {self.artifactory_url}/{repository_name}/{file_name}')
+
+        if not local_file:
+            local_file = os.path.join(os.getcwd(), file_name.split('/')[-1])
+        else:
+            local_file = os.path.abspath(local_file)
+
+        loop = asyncio.get_running_loop()
+        self._get_session()
+        temp_file = f'{local_file}.{uuid.uuid4().hex[:8]}.part'
+
+        async with self._transfer_slots:
+            response = await self.get(f'{repository_name}/{file_name}', stream=True)
+
+            try:
+                checksum_type, provided_checksum = _expected_checksum(response.headers, checksum_type)
+                hash_obj = hashlib.new(checksum_type)
+
+                def save_chunk(chunk):
+                    hash_obj.update(chunk)
+                    handle.write(chunk)
+
+                handle = await loop.run_in_executor(None, open, temp_file, 'xb')
+                try:
+                    async for chunk in response.content.iter_chunked(TRANSFER_CHUNK_SIZE):
+                        await loop.run_in_executor(None, save_chunk, chunk)
+                finally:
+                    await loop.run_in_executor(None, handle.close)
+
+                _validate_checksum(checksum_type, provided_checksum, hash_obj.hexdigest())
+
+                os.replace(temp_file, local_file)
+            except OSError as ose:
+                logging.exception(ose)
+                raise ArtifactoryRequestException(ose)
+            finally:
+                response.release()
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+
+        logging.info(f'File saved to {local_file}')
+
+        if return_extra_data:
+            return local_file, response.headers
+
+        return local_file
+
+    async def upload_file(self, repository_name, file_name, local_file, checksum_deploy=True, return_extra_data=False):  # pylint: disable=too-many-locals
+        """Upload a local file to Artifactory.
+
+        The checksums are calculated in a worker thread so the event loop is not blocked, and a checksum-only deploy
+        is attempted first just like `Artifactory.upload_file`. The file is streamed from disk when it has to be
+        sent.
+
+        :param repository_name:     Artifactory repository name (e.g., conit-file-local)
+        :type: repository_name:     str
+        :param file_name:           Name and path of the file in the remote repository
+        :type file_name:            str
+        :param local_file:          Path to the local file to be uploaded. The path MUST include the filename!
+        :type local_file:           str
+        :param checksum_deploy:     (Optional) Set this to `False` to skip the checksum-only deploy and always send
+                                    the file.
+        :type checksum_deploy:      bool
+        :param return_extra_data:   (Optional) Set this to `True` to also return a dict saying whether the checksum
+                                    deploy was used (`checksum_deploy`) and how many bytes were sent (`bytes_sent`).
+        :type return_extra_data:    bool
+        :return:                    Full path to the remote file once the upload is complete.
+        :rtype:                     str or tuple(str, dict)
+        """
+        local_file = os.path.abspath(local_file)
+
+        logging.info(f'Uploading file {local_file}')
+
+        if not os.path.exists(local_file):
+            raise OSError(f'The given file at {local_file} does not exist or is not accessible by the current user.')
+
+        loop = asyncio.get_running_loop()
+        self._get_session()
+
+        async with self._transfer_slots:
+            checksums = await loop.run_in_executor(None, generate_checksums, local_file, CHECKSUM_HEADERS)
+            upload_headers = {header: checksums[checksum_type] for checksum_type, header in CHECKSUM_HEADERS.items()}
+
+            url_path = os.path.join(repository_name, file_name)
+            extra_data = {'checksum_deploy': False, 'bytes_sent': 0}
+            response = None
+
+            if checksum_deploy:
+                try:
+                    response = await self.put(url_path, **upload_headers, **{'X-Checksum-Deploy': 'true'})
+                    extra_data['checksum_deploy'] = True
+                except aiohttp.ClientResponseError as err:
+                    if err.status != 404:
+                        raise
+
+            if response is None:
+                file_size = os.path.getsize(local_file)
+
+                with open(local_file, 'rb') as handle:
+                    async def read_chunks():
+                        while True:
+                            chunk = await loop.run_in_executor(None, handle.read, TRANSFER_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            yield chunk
+
+                    upload_headers['Content-Length'] = file_size
+                    response = await self.put(url_path, data=read_chunks(), **upload_headers)
+
+                extra_data['bytes_sent'] = file_size
+
+        upload_location = response.headers['Location']
+
+        logging.info(f'File successfully uploaded to {upload_location}')
+
+        if return_extra_data:
+            return upload_location, extra_data
+
+        return upload_location
+
+    async def aql_query(self, aql, encoding='UTF-8'):
+        """
+        Executes an arbitrary AQL query against the Artifactory AQL API
+
+        :param aql:         The AQL string representing the query to run
+        :type aql:          str
+        :param encoding:    The encoding used to decode the response
+        :type encoding:     str
+        :return:            A JSON object representing the query result, or None if the query failed
+        :rtype:             json
+        """
+        try:
+            response = await self.post(self.aql_api, data=aql)
+            return json.loads((await response.read()).decode(encoding))
+        except Exception as err:  # pylint: disable=broad-except
+            logging.exception(err)
+            return None
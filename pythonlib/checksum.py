@@ -2,8 +2,28 @@
 Common module for functions that deal with checksums
 """
 import hashlib
+import itertools
 import logging
 import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+
+# Size of the buffer files are read into when hashing; large reads keep the per-call overhead negligible
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+
+# Checksum types of manifest entries, by the length of their hex digest
+DIGEST_LENGTHS = {32: 'md5', 40: 'sha1', 56: 'sha224', 64: 'sha256', 96: 'sha384', 128: 'sha512'}
+
+# A manifest line: `<checksum> <path>` as written by `generate_checksum`, or `<checksum>  <path>` and
+# `<checksum> *<path>` as written by the coreutils `*sum` tools
+MANIFEST_LINE = re.compile(r'^(?P<checksum>[0-9a-fA-F]+) [ *]?(?P<path>.+)$')
+
+
+def _file_state(stat):
+    """Parts of a file's status that change when its content does (the access time is left out)"""
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns
 
 
 def generate_checksum(file_path, checksum_type, output_filename=None, skip_files=None):  # pylint: disable=too-many-locals,too-many-branches
@@ -15,6 +35,10 @@ def generate_checksum(file_path, checksum_type, output_filename=None, skip_files
     a given directory by generating a combined checksum of everything in the
     directory.
 
+    The directory checksum depends on the order `os.walk` returns files in and
+    ignores file names, so it should only be compared on the same machine. Use
+    `generate_tree_checksum` for a digest that is stable across machines.
+
     :param file_path:       Location of the file or directory to be checksummed
     :type file_path:        str
     :param checksum_type:   Algorithm to use when calculating the checksum
@@ -101,3 +125,369 @@ def generate_checksum(file_path, checksum_type, output_filename=None, skip_files
             o_file.write(f'{checksum} {file_path}')
 
     return checksum
+
+
+def generate_checksums(file_path, checksum_types, block_size=CHECKSUM_BLOCK_SIZE, cache=None):
+    """Generate several checksums for a file in a single pass.
+
+    Reads the file once into a reusable buffer and feeds every requested hash from it, instead of reading the
+    whole file once per checksum in small blocks like `generate_checksum`. Only files are supported.
+
+    If a `ChecksumCache` is given, checksums of a file that hasn't changed since it was last hashed are returned
+    from the cache without reading the file.
+
+    :param file_path:       Location of the file to be checksummed
+    :type file_path:        str
+    :param checksum_types:  Algorithms to use when calculating the checksums (e.g., ['md5', 'sha1', 'sha256'])
+    :type checksum_types:   list
+    :param block_size:      (optional) Size of the read buffer, in bytes
+    :type block_size:       int
+    :param cache:           (optional) Persistent cache of checksums
+    :type cache:            pythonlib.checksum_cache.ChecksumCache
+    :return:                Dict of checksum type -> checksum
+    :rtype:                 dict
+    """
+    file_path = os.path.abspath(file_path)
+
+    if not os.path.isfile(file_path):
+        error = f'The given file does not exist, is not a file or you do not have permission to access it: {file_path}'
+        logging.error(error)
+        raise OSError(error)
+
+    cached = {}
+    if cache:
+        stat = os.stat(file_path)
+        cached = cache.get(stat, checksum_types)
+
+    hash_objs = {}
+    for checksum_type in checksum_types:
+        if checksum_type in cached:
+            continue
+        try:
+            hash_objs[checksum_type] = hashlib.new(checksum_type)
+        except ValueError:
+            error = f'{checksum_type} is not a valid checksum type'
+            logging.error(error)
+            raise AttributeError(error)
+
+    if hash_objs:
+        buffer = bytearray(block_size)
+        view = memoryview(buffer)
+
+        with open(file_path, 'rb', buffering=0) as c_file:
+            while True:
+                read_size = c_file.readinto(buffer)
+                if not read_size:
+                    break
+                for hash_obj in hash_objs.values():
+                    hash_obj.update(view[:read_size])
+
+    checksums = {checksum_type: hash_obj.hexdigest() for checksum_type, hash_obj in hash_objs.items()}
+
+    # Only cache the result if the file didn't change while it was being read
+    if cache and checksums and _file_state(os.stat(file_path)) == _file_state(stat):
+        cache.put(stat, checksums)
+
+    checksums.update(cached)
+    return {checksum_type: checksums[checksum_type] for checksum_type in checksum_types}
+
+
+def generate_tree_checksum(dir_path, checksum_type='sha256', manifest_file=None, skip_files=None, max_workers=None,  # pylint: disable=too-many-locals
+                           cache=None):
+    """Generate a deterministic checksum for a directory tree.
+
+    Every file under the directory is hashed on its own, in parallel on a process pool, and the tree checksum is
+    the checksum of the sorted list of `<checksum>  <relative path>` lines, which is exactly what is written to
+    `manifest_file`. Renaming or moving a file therefore changes the tree checksum, and the same tree gives the
+    same checksum on every machine. Empty directories are not included.
+
+    The manifest uses the `sha256sum` format with paths relative to `dir_path`, so it can be checked with e.g.
+    `cd dir_path && sha256sum -c manifest_file`.
+
+    :param dir_path:        Location of the directory to be checksummed
+    :type dir_path:         str
+    :param checksum_type:   (optional) Algorithm to use when calculating the checksums
+    :type checksum_type:    str
+    :param manifest_file:   (optional) Location of a file to save the checksum of every file to. It is skipped
+                            if it is inside the directory.
+    :type manifest_file:    str
+    :param skip_files:      (optional) List of file names to skip when generating the checksum
+    :type skip_files:       list
+    :param max_workers:     (optional) Number of processes used to hash files. Defaults to the number of CPUs;
+                            set it to 1 to hash files in the current process.
+    :type max_workers:      int
+    :param cache:           (optional) Persistent cache of checksums, used to skip reading unchanged files
+    :type cache:            pythonlib.checksum_cache.ChecksumCache
+    :return:                Checksum for the directory tree
+    :rtype:                 str
+    """
+    dir_path = os.path.abspath(dir_path)
+
+    if skip_files is None:
+        skip_files = list()
+
+    if not isinstance(skip_files, list):
+        error = f'`skip_files` must be a list, instead it is {type(skip_files)}'
+        logging.error(error)
+        raise TypeError(error)
+
+    if not os.path.isdir(dir_path):
+        error = f'The given directory does not exist or you do not have permission to access it: {dir_path}'
+        logging.error(error)
+        raise OSError(error)
+
+    try:
+        hash_obj = hashlib.new(checksum_type)
+    except ValueError:
+        error = f'{checksum_type} is not a valid checksum type'
+        logging.error(error)
+        raise AttributeError(error)
+
+    if manifest_file:
+        manifest_file = os.path.abspath(manifest_file)
+
+    rel_paths = []
+    for root, dirs, files in os.walk(dir_path):
+        dirs.sort()
+        for fle in sorted(files):
+            check_file = os.path.join(root, fle)
+            if fle not in skip_files and check_file != manifest_file:
+                rel_paths.append(os.path.relpath(check_file, dir_path).replace(os.sep, '/'))
+
+    # Sort the full relative paths, as sorting each directory's entries separately does not give a global order
+    rel_paths.sort()
+    check_files = [os.path.join(dir_path, rel_path) for rel_path in rel_paths]
+
+    if max_workers == 1:
+        results = [generate_checksums(check_file, [checksum_type], cache=cache) for check_file in check_files]
+    else:
+        # Hand files to the workers in chunks to keep the inter-process overhead low for trees of small files
+        chunk_size = max(1, len(check_files) // ((max_workers or os.cpu_count() or 1) * 4))
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(generate_checksums, check_files, itertools.repeat([checksum_type]),
+                                        itertools.repeat(CHECKSUM_BLOCK_SIZE), itertools.repeat(cache),
+                                        chunksize=chunk_size))
+
+    manifest = ''.join(f'{result[checksum_type]}  {rel_path}\n' for rel_path, result in zip(rel_paths, results))
+    hash_obj.update(manifest.encode('utf-8', 'surrogateescape'))
+
+    if manifest_file:
+        with open(manifest_file, 'w', encoding='utf-8', errors='surrogateescape') as o_file:
+            o_file.write(manifest)
+
+    return hash_obj.hexdigest()
+
+
+def _parse_manifest(manifest_path, malformed, checksum_type=None):
+    """Read the entries of a checksum manifest as the file is read.
+
+    :param manifest_path:   Location of the manifest
+    :type manifest_path:    str
+    :param malformed:       List the numbers of malformed lines are appended to
+    :type malformed:        list
+    :param checksum_type:   (optional) Algorithm of every checksum in the manifest. By default it is inferred from
+                            the length of each checksum.
+    :type checksum_type:    str
+    :return:                Generator yielding (path, checksum type, checksum) entries
+    :rtype:                 generator
+    """
+    with open(manifest_path, encoding='utf-8', errors='surrogateescape') as m_file:
+        for line_number, line in enumerate(m_file, start=1):
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+
+            # The coreutils tools prefix lines with a backslash when the file name contains one or a newline
+            escaped = line.startswith('\\')
+            match = MANIFEST_LINE.match(line[1:] if escaped else line)
+            entry_type = checksum_type or (DIGEST_LENGTHS.get(len(match.group('checksum'))) if match else None)
+
+            if not match or not entry_type:
+                malformed.append(line_number)
+                continue
+
+            path = match.group('path')
+            if escaped:
+                path = path.replace('\\\\', '\0').replace('\\n', '\n').replace('\0', '\\')
+
+            yield path, entry_type, match.group('checksum').lower()
+
+
+def _verify_entry(file_path, checksum_type, expected, cache=None):
+    """Check a single manifest entry.
+
+    :return:    Status of the entry (ok, mismatch, missing or unreadable), and the checksum of the file if it was
+                read or the error if it couldn't be
+    :rtype:     tuple(str, str)
+    """
+    if not os.path.isfile(file_path):
+        return 'missing', None
+
+    try:
+        actual = generate_checksums(file_path, [checksum_type], cache=cache)[checksum_type]
+    except OSError as err:
+        return 'unreadable', str(err)
+
+    return ('ok' if actual == expected else 'mismatch'), actual
+
+
+def verify_manifest(manifest_path, workers=None, fail_fast=False, base_dir=None, checksum_type=None, cache=None):  # pylint: disable=too-many-locals,too-many-arguments
+    """Verify the files listed in a checksum manifest.
+
+    Reads manifests written by `generate_checksum`, `generate_tree_checksum` and the coreutils `*sum` tools, and
+    hashes the listed files concurrently with large reads. The manifest is read as the files are verified and only
+    a small window of files is queued at once, so manifests of any size can be checked. Lines that are blank or
+    start with `#` are ignored.
+
+    A sample of the returned report:
+
+        {
+            'manifest': '/path/to/manifest.sha256',
+            'ok': False,
+            'total': 1200,
+            'verified': 1198,
+            'mismatched': [
+                {'path': '/path/to/file.bin', 'checksum_type': 'sha256', 'expected': 'e3b0...', 'actual': '5891...'}
+            ],
+            'missing': ['/path/to/gone.bin'],
+            'unreadable': [{'path': '/path/to/locked.bin', 'error': "[Errno 13] Permission denied: '...'"}],
+            'malformed': [],
+            'skipped': 0,
+            'duration': 4.2
+        }
+
+    :param manifest_path:   Location of the manifest
+    :type manifest_path:    str
+    :param workers:         (optional) Number of files hashed at once. Defaults to the number of CPUs.
+    :type workers:          int
+    :param fail_fast:       (optional) Set this to `True` to stop at the first missing, unreadable or mismatched
+                            file. Files that were not checked are counted as `skipped`.
+    :type fail_fast:        bool
+    :param base_dir:        (optional) Directory relative paths in the manifest are resolved against. Defaults to
+                            the current directory, like `sha256sum -c`.
+    :type base_dir:         str
+    :param checksum_type:   (optional) Algorithm of every checksum in the manifest. By default it is inferred from
+                            the length of each checksum.
+    :type checksum_type:    str
+    :param cache:           (optional) Persistent cache of checksums
+    :type cache:            pythonlib.checksum_cache.ChecksumCache
+    :return:                Report of the verification; `ok` is True only if every file matched
+    :rtype:                 dict
+    """
+    manifest_path = os.path.abspath(manifest_path)
+    base_dir = os.path.abspath(base_dir or os.getcwd())
+
+    if not os.path.isfile(manifest_path):
+        error = f'The given manifest does not exist or you do not have permission to access it: {manifest_path}'
+        logging.error(error)
+        raise OSError(error)
+
+    start = time.monotonic()
+    malformed = []
+    entries = _parse_manifest(manifest_path, malformed, checksum_type)
+    workers = workers or os.cpu_count()
+
+    report = {
+        'manifest': manifest_path,
+        'ok': False,
+        'total': 0,
+        'verified': 0,
+        'mismatched': [],
+        'missing': [],
+        'unreadable': [],
+        'malformed': malformed,
+        'skipped': 0,
+        'duration': 0.0,
+    }
+
+    def collect(done_futures):
+        for future in done_futures:
+            file_path, entry_type, expected = in_flight.pop(future)
+            status, actual = future.result()
+
+            if status == 'ok':
+                report['verified'] += 1
+            elif status == 'missing':
+                report['missing'].append(file_path)
+            elif status == 'unreadable':
+                report['unreadable'].append({'path': file_path, 'error': actual})
+            else:
+                report['mismatched'].append({'path': file_path, 'checksum_type': entry_type, 'expected': expected,
+                                             'actual': actual})
+
+    def failed():
+        return fail_fast and (report['missing'] or report['unreadable'] or report['mismatched'])
+
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path, entry_type, expected in entries:
+            report['total'] += 1
+
+            if len(in_flight) >= workers * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            if failed():
+                report['skipped'] += 1
+                continue
+
+            file_path = os.path.join(base_dir, path)
+            in_flight[executor.submit(_verify_entry, file_path, entry_type, expected, cache)] = \
+                (file_path, entry_type, expected)
+
+        collect(wait(in_flight).done)
+
+    report['ok'] = not (report['missing'] or report['unreadable'] or report['mismatched'] or report['malformed'] or
+                        report['skipped'])
+    report['duration'] = time.monotonic() - start
+
+    for file_path in report['missing']:
+        logging.error(f'{file_path}: missing')
+    for unreadable in report['unreadable']:
+        logging.error(f'{unreadable["path"]}: unreadable ({unreadable["error"]})')
+    for mismatch in report['mismatched']:
+        logging.error(f'{mismatch["path"]}: {mismatch["checksum_type"]} mismatch')
+    for line_number in malformed:
+        logging.error(f'{manifest_path}:{line_number}: improperly formatted checksum line')
+
+    logging.info(f'Verified {report["verified"]} of {report["total"]} files from {manifest_path} in '
+                 f'{report["duration"]:.2f}s')
+
+    return report
+
+
+def benchmark_checksums(file_path, checksum_types=('md5', 'sha1', 'sha256'), repeat=3):
+    """Compare `generate_checksums` with calling `generate_checksum` once per checksum type.
+
+    Each approach is timed `repeat` times and the fastest run is kept, so the numbers reflect a warm page cache
+    rather than the first read from disk.
+
+    :param file_path:       Location of the file to be checksummed
+    :type file_path:        str
+    :param checksum_types:  (optional) Algorithms to use when calculating the checksums
+    :type checksum_types:   list
+    :param repeat:          (optional) Number of times each approach is timed
+    :type repeat:           int
+    :return:                Seconds taken by `generate_checksum` and `generate_checksums`, and the speedup
+    :rtype:                 dict
+    """
+    timings = {}
+
+    for name, func in (
+            ('generate_checksum', lambda: [generate_checksum(file_path, checksum_type) for checksum_type in checksum_types]),
+            ('generate_checksums', lambda: generate_checksums(file_path, checksum_types)),
+    ):
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            runs.append(time.perf_counter() - start)
+        timings[name] = min(runs)
+
+    timings['speedup'] = timings['generate_checksum'] / timings['generate_checksums']
+
+    logging.info(f'generate_checksum: {timings["generate_checksum"]:.3f}s, generate_checksums: '
+                 f'{timings["generate_checksums"]:.3f}s ({timings["speedup"]:.1f}x faster)')
+
+    return timings
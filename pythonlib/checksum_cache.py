@@ -0,0 +1,158 @@
+"""
+Persistent cache of file checksums, so unchanged files don't have to be read again
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+
+# Default cap on the number of checksums kept in the cache
+DEFAULT_MAX_ENTRIES = 1000000
+
+# Number of writes made through a connection between checks of the cache size
+PRUNE_INTERVAL = 1000
+
+# Files modified this recently are not cached, since a write in the same timestamp tick as the hash would go unnoticed
+RACY_WINDOW_NS = 2 * 1000000000
+
+
+class ChecksumCache:
+    """SQLite store of file checksums keyed by the identity and state of each file.
+
+    An entry is stored per (device, inode, algorithm) together with the size, modification time and inode change
+    time of the file when it was hashed, and is only returned if all of them still match. Any write to the file,
+    or replacing it with another file, therefore invalidates the entry, and the stale entry is overwritten the next
+    time the file is hashed. Files modified within the last couple of seconds are not cached at all, since a write
+    that lands in the same timestamp tick as the hash would not change the modification time.
+
+    The cache holds at most `max_entries` checksums; the least recently used ones are removed beyond that. Each
+    thread and process opens its own connection to the database, so the cache can be shared by thread pools and
+    passed to process pools.
+    """
+
+    def __init__(self, db_path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.db_path = os.path.abspath(db_path)
+        self.max_entries = max_entries
+
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # Connections can't be pickled; the receiving process opens its own
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _connection(self):
+        """Get the database connection of the current thread, opening it if needed.
+
+        :return:    Database connection
+        :rtype:     sqlite3.Connection
+        """
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.db_path, timeout=60)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS checksums ('
+                'device INTEGER, inode INTEGER, algorithm TEXT, size INTEGER, mtime_ns INTEGER, ctime_ns INTEGER, '
+                'checksum TEXT, last_used REAL, PRIMARY KEY (device, inode, algorithm))'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS checksums_last_used ON checksums (last_used)')
+
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+            self._local.writes = 0
+
+        return connection
+
+    def get(self, stat, checksum_types):
+        """Look up the cached checksums of a file.
+
+        :param stat:            Result of `os.stat()` for the file
+        :type stat:             os.stat_result
+        :param checksum_types:  Algorithms to look up (e.g., ['md5', 'sha1'])
+        :type checksum_types:   list
+        :return:                Dict of checksum type -> checksum for the checksums that were found
+        :rtype:                 dict
+        """
+        connection = self._connection()
+        found = {}
+
+        for checksum_type in checksum_types:
+            row = connection.execute(
+                'SELECT checksum FROM checksums WHERE device = ? AND inode = ? AND algorithm = ? AND size = ? '
+                'AND mtime_ns = ? AND ctime_ns = ?',
+                (stat.st_dev, stat.st_ino, checksum_type, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns)
+            ).fetchone()
+
+            if row:
+                found[checksum_type] = row[0]
+
+        if found:
+            with connection:
+                connection.execute(
+                    f'UPDATE checksums SET last_used = ? WHERE device = ? AND inode = ? AND algorithm IN '
+                    f'({", ".join("?" * len(found))})',
+                    (time.time(), stat.st_dev, stat.st_ino, *found)
+                )
+
+        return found
+
+    def put(self, stat, checksums):
+        """Save the checksums of a file.
+
+        The checksums are not saved if the file was modified too recently for the cache to detect a later change.
+
+        :param stat:        Result of `os.stat()` for the file, taken before it was hashed
+        :type stat:         os.stat_result
+        :param checksums:   Dict of checksum type -> checksum
+        :type checksums:    dict
+        :return:            None
+        :rtype:             None
+        """
+        if time.time_ns() - stat.st_mtime_ns < RACY_WINDOW_NS:
+            return
+
+        connection = self._connection()
+        now = time.time()
+
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO checksums VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(stat.st_dev, stat.st_ino, checksum_type, stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, checksum,
+                  now) for checksum_type, checksum in checksums.items()]
+            )
+
+        self._local.writes += len(checksums)
+        if self._local.writes >= PRUNE_INTERVAL:
+            self._local.writes = 0
+            self.prune()
+
+    def prune(self):
+        """Remove the least recently used checksums until the cache is within `max_entries`.
+
+        :return:    Number of checksums removed
+        :rtype:     int
+        """
+        connection = self._connection()
+
+        with connection:
+            excess = connection.execute('SELECT COUNT(*) FROM checksums').fetchone()[0] - self.max_entries
+            if excess <= 0:
+                return 0
+
+            connection.execute(
+                'DELETE FROM checksums WHERE rowid IN (SELECT rowid FROM checksums ORDER BY last_used LIMIT ?)',
+                (excess,)
+            )
+
+        logging.debug(f'Removed {excess} checksums from the checksum cache')
+        return excess
@@ -2,13 +2,42 @@
 """
 Contains connection objects and helper functions to connect and run SQL on Oracle databases
 """
+import csv
+import itertools
 import logging
+import re
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import ExitStack, contextmanager
 
 import cx_Oracle
 import sqlparse
 
 from .custom_exception import CommonException
+from .sql_splitter import is_plsql_block, split_sql_file
+
+# NumPy is optional; without it columnar batches are returned as lists
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Number of parsed statements each connection keeps, so repeated statements with bind variables skip the parse
+DEFAULT_STMT_CACHE_SIZE = 50
+
+# Number of rows sent to the database in each round trip by `bulk_load`
+DEFAULT_BATCH_SIZE = 1000
+
+# Unquoted Oracle identifier, which column names must be since they can't be passed as bind variables
+IDENTIFIER = re.compile(r'^[A-Za-z][\w$#]*$')
+
+# Ways `run_sql_script` can split a script into statements
+SQL_SPLITTERS = ('sqlparse', 'stream')
+
+# Number of rows fetched from the database in each round trip by `fetch`
+DEFAULT_ARRAYSIZE = 1000
 
 
 class DatabaseConnectionFailed(CommonException):
@@ -16,15 +45,22 @@ class DatabaseConnectionFailed(CommonException):
 
 
 class OracleDatabase:
-    """Primary object for interacting with Oracle DBs"""
+    """Primary object for interacting with Oracle DBs
 
-    def __init__(self, db_hostname='db', db_user='SYS', db_passwd='Welcome1!', service_name='MYPDB', db_user_role='SYSDBA', log_domain=''):
+    By default a single connection is opened with `connect()` and every statement runs on its shared cursor. For
+    multi-threaded use, call `create_pool()` instead; statements then run on connections borrowed from a session pool,
+    and workers can borrow their own connection with `acquire()`.
+    """
+
+    def __init__(self, db_hostname='db', db_user='SYS', db_passwd='Welcome1!', service_name='MYPDB', db_user_role='SYSDBA', log_domain='',
+                 stmt_cache_size=DEFAULT_STMT_CACHE_SIZE):
         self.db_hostname = db_hostname
         self.db_passwd = db_passwd
         self.db_user = db_user
         self.db_user_role = db_user_role
         self.service_name = service_name
         self.log_domain = log_domain
+        self.stmt_cache_size = stmt_cache_size
 
         self.log = logging.getLogger(self.log_domain)
 
@@ -34,43 +70,449 @@ class OracleDatabase:
         # Global DB cursor object
         self.cursor = None
 
-    def run_sql_script(self, sql_file_path):
+        # Session pool, used instead of the global connection once `create_pool()` is called
+        self.pool = None
+        self._pool_counters = {'acquired': 0, 'health_check_failures': 0}
+        self._pool_lock = threading.Lock()
+
+    def run_sql_script(self, sql_file_path, splitter='sqlparse'):
         """
         Execute all SQL statements in a given file
 
         :param sql_file_path:   The path of the SQL file to run
         :type sql_file_path:    str
+        :param splitter:        (Optional) How the file is split into statements: `sqlparse` reads the whole file
+                                and splits it with `sqlparse.split`, `stream` splits it as it is read with
+                                `sql_splitter.split_sql_file`, which is much faster on large scripts and ends PL/SQL
+                                blocks on a `/` line like SQL*Plus.
+        :type splitter:         str
         :return:                None
         :rtype:                 None
         """
-        with open(sql_file_path, 'r') as sql_file:
-            for sql_query in sqlparse.split(sql_file.read()):
+        sql_queries = _split_script(sql_file_path, splitter)
+
+        # A pooled script runs on one connection so session settings and transactions carry across statements
+        with self.acquire() as (connection, cursor):
+            for sql_query in sql_queries:
                 if sql_query:
                     self.log.debug(f'Executing SQL:\n{sql_query}')
-                    self.run_sql(sql_query)
+                    self._run_statement(cursor, sql_query)
+
+            if self.pool:
+                connection.commit()
+
+    def run_sql_scripts(self, scripts, dependencies=None, max_workers=None, splitter='sqlparse'):  # pylint: disable=too-many-locals
+        """Run several SQL scripts, in parallel where their dependencies allow it.
+
+        Each script runs on its own connection from the session pool as a single transaction: it is committed once
+        every statement has run, and rolled back at the first statement that fails (DDL statements commit
+        implicitly in Oracle, so they are not rolled back). Unlike `run_sql_script`, a failing statement fails the
+        script. A script only starts once all the scripts it depends on have succeeded, and is skipped if any of
+        them failed or were skipped, so the total run time is roughly that of the longest chain of dependencies.
+        Without a session pool the scripts run one at a time on the global connection.
+
+            db.run_sql_scripts(['users.sql', 'schema.sql', 'seed.sql'], dependencies={'seed.sql': ['schema.sql']})
+
+        A sample of the returned report:
+
+            {
+                'succeeded': {'users.sql': {'duration': 1.2, 'statements': 14}, ...},
+                'failed': {'seed.sql': {'duration': 0.4, 'statements': 3, 'error': 'ORA-00942: ...'}},
+                'skipped': ['grants.sql'],
+                'duration': 5.1
+            }
+
+        :param scripts:         Paths of the SQL files to run
+        :type scripts:          list
+        :param dependencies:    (Optional) Dict of script -> list of scripts that must succeed before it runs
+        :type dependencies:     dict
+        :param max_workers:     (Optional) Number of scripts run at once. Defaults to the maximum size of the pool.
+        :type max_workers:      int
+        :param splitter:        (Optional) How scripts are split into statements; see `run_sql_script`
+        :type splitter:         str
+        :return:                Timing and outcome of every script
+        :rtype:                 dict
+        :raises:                ValueError
+        """
+        if splitter not in SQL_SPLITTERS:
+            raise ValueError(f'Unknown SQL splitter: {splitter}')
+
+        duplicates = sorted({script for script in scripts if scripts.count(script) > 1})
+        if duplicates:
+            raise ValueError(f'Scripts are listed more than once: {", ".join(duplicates)}')
+
+        dependencies = dependencies or {}
+        unknown = sorted(set(dependencies) - set(scripts))
+        if unknown:
+            raise ValueError(f'Dependencies are given for scripts that are not being run: {", ".join(unknown)}')
+
+        waiting_on = {script: set(dependencies.get(script, [])) for script in scripts}
+        dependents = {script: [] for script in scripts}
+
+        for script, required in waiting_on.items():
+            unknown = required - set(scripts)
+            if unknown:
+                raise ValueError(f'{script} depends on scripts that are not being run: {", ".join(sorted(unknown))}')
+            for dependency in required:
+                dependents[dependency].append(script)
+
+        _check_acyclic(waiting_on)
+
+        if not self.pool:
+            max_workers = 1
+
+        results = {'succeeded': {}, 'failed': {}, 'skipped': []}
+        start = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.pool.max) as executor:
+            futures = {}
+
+            def submit_ready(candidates):
+                for script in candidates:
+                    if not waiting_on[script]:
+                        futures[executor.submit(self._run_script_transaction, script, splitter)] = script
+
+            def skip_dependents(script):
+                for dependent in dependents[script]:
+                    if dependent not in results['skipped']:
+                        self.log.warning(f'Skipping {dependent} because {script} did not succeed')
+                        results['skipped'].append(dependent)
+                        skip_dependents(dependent)
+
+            submit_ready(scripts)
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    script = futures.pop(future)
+                    outcome = future.result()
+
+                    if 'error' in outcome:
+                        results['failed'][script] = outcome
+                        skip_dependents(script)
+                        continue
+
+                    results['succeeded'][script] = outcome
+
+                    for dependent in dependents[script]:
+                        waiting_on[dependent].discard(script)
+                    submit_ready(dependent for dependent in dependents[script] if dependent not in results['skipped'])
+
+        results['duration'] = time.monotonic() - start
+
+        self.log.info(f'Ran {len(scripts)} scripts in {results["duration"]:.2f}s: {len(results["succeeded"])} '
+                      f'succeeded, {len(results["failed"])} failed, {len(results["skipped"])} skipped')
+
+        return results
+
+    def _run_script_transaction(self, sql_file_path, splitter):
+        """Run a SQL script as one transaction on its own connection.
+
+        :param sql_file_path:   The path of the SQL file to run
+        :type sql_file_path:    str
+        :param splitter:        How the script is split into statements
+        :type splitter:         str
+        :return:                Duration and number of statements run, plus the error if the script failed
+        :rtype:                 dict
+        """
+        self.log.info(f'Running {sql_file_path}...')
+
+        start = time.monotonic()
+        outcome = {'statements': 0}
+
+        try:
+            with self.acquire() as (connection, cursor):
+                try:
+                    for sql_query in _split_script(sql_file_path, splitter):
+                        if sql_query:
+                            self.log.debug(f'Executing SQL:\n{sql_query}')
+                            cursor.execute(_strip_terminator(sql_query))
+                            outcome['statements'] += 1
+
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+        except Exception as err:  # pylint: disable=broad-except
+            # Any failure, including an unreadable script, only fails this script and its dependents
+            outcome['error'] = str(err)
+            self.log.error(f'{sql_file_path} failed after {outcome["statements"]} statements: {err}')
+
+        outcome['duration'] = time.monotonic() - start
+
+        if 'error' not in outcome:
+            self.log.info(f'Finished {sql_file_path} in {outcome["duration"]:.2f}s')
+
+        return outcome
 
     def run_sql(self, sql_query):
         """Execute arbitrary SQL against the database.
 
         Run a given SQL query against the database. Must provide a connection object which can be obtained
-        by calling the `wait_for_db()` function first.
+        by calling the `wait_for_db()` function first. When a session pool is used, the query is committed since the
+        connection it ran on goes back to the pool.
 
         :param sql_query:   SQL query to execute against the DB
         :type sql_query:    str
         :return:            0 for success, 1 for failure
         """
-        try:
-            # Remove any semicolons from the end of SQL statements to avoid a parsing error from Oracle
-            sql_query = sql_query.replace(';', '')
+        with self.acquire() as (connection, cursor):
+            self._run_statement(cursor, sql_query)
+
+            if self.pool:
+                connection.commit()
+
+    def _run_statement(self, cursor, sql_query):
+        """Execute a single SQL statement, logging any database error.
 
-            self.cursor.execute(sql_query)
+        :param cursor:      Cursor to execute the statement on
+        :type cursor:       cx_Oracle.Cursor
+        :param sql_query:   SQL statement to execute
+        :type sql_query:    str
+        :return:            None
+        :rtype:             None
+        """
+        try:
+            cursor.execute(_strip_terminator(sql_query))
         except cx_Oracle.DatabaseError as dbe:  # pylint: disable=c-extension-no-member
             self.log.exception(dbe)
 
+    def execute(self, sql, params=None):
+        """Execute a SQL statement with bind variables.
+
+        Values should be passed as binds rather than formatted into the SQL, so the statement text stays the same
+        between calls and is parsed once per connection instead of once per value:
+
+            db.execute('INSERT INTO builds (name, status) VALUES (:name, :status)', {'name': name, 'status': 'ok'})
+            db.execute('DELETE FROM builds WHERE id = :1', [build_id])
+
+        Unlike `run_sql`, database errors are raised. When a session pool is used, the statement is committed since
+        the connection it ran on goes back to the pool.
+
+        :param sql:     SQL statement to execute. A trailing semicolon is removed unless it ends a PL/SQL block.
+        :type sql:      str
+        :param params:  (Optional) Values of the named (dict) or positional (list) bind variables
+        :type params:   dict or list
+        :return:        Number of rows affected
+        :rtype:         int
+        """
+        with self.acquire() as (connection, cursor):
+            cursor.execute(_strip_terminator(sql), params or {})
+            row_count = cursor.rowcount
+
+            if self.pool:
+                connection.commit()
+
+        return row_count
+
+    def query(self, sql, params=None):
+        """Run a query with bind variables and return its rows.
+
+        See `execute` for how to pass bind variables. Database errors are raised.
+
+        :param sql:     SQL query to run. A trailing semicolon is removed.
+        :type sql:      str
+        :param params:  (Optional) Values of the named (dict) or positional (list) bind variables
+        :type params:   dict or list
+        :return:        Rows returned by the query
+        :rtype:         list(tuple)
+        """
+        with self.acquire() as (_, cursor):
+            cursor.execute(_strip_terminator(sql), params or {})
+            return cursor.fetchall()
+
+    def fetch(self, sql, params=None, batch_size=None, columnar=False, arraysize=DEFAULT_ARRAYSIZE):  # pylint: disable=too-many-arguments
+        """Run a query and stream its rows.
+
+        Rows are fetched from the database `arraysize` rows per round trip and yielded as they arrive, so a scan of
+        any size only holds one fetch in memory:
+
+            for row in db.fetch('SELECT id, name FROM builds WHERE status = :status', {'status': 'ok'}):
+                ...
+
+            for batch in db.fetch('SELECT id, size FROM artifacts', batch_size=50000, columnar=True):
+                total += batch['SIZE'].sum()
+
+        The query runs on its own cursor, and with a session pool on its own connection, which is held until the
+        generator is exhausted or closed.
+
+        :param sql:         SQL query to run. A trailing semicolon is removed.
+        :type sql:          str
+        :param params:      (Optional) Values of the named (dict) or positional (list) bind variables
+        :type params:       dict or list
+        :param batch_size:  (Optional) Yield lists of up to this many rows instead of single rows
+        :type batch_size:   int
+        :param columnar:    (Optional) Yield each batch as a dict of column name -> values instead of a list of rows.
+                            The values are NumPy arrays when NumPy is installed, otherwise lists. Batches default to
+                            `arraysize` rows.
+        :type columnar:     bool
+        :param arraysize:   (Optional) Number of rows fetched per round trip
+        :type arraysize:    int
+        :return:            Generator yielding rows, lists of rows or dicts of columns
+        :rtype:             generator
+        """
+        if columnar and not batch_size:
+            batch_size = arraysize
+
+        with self.acquire() as (connection, _):
+            cursor = connection.cursor()
+
+            try:
+                cursor.arraysize = arraysize
+                # Prefetching was added in cx_Oracle 8; it saves a round trip on the first fetch
+                if hasattr(cursor, 'prefetchrows'):
+                    cursor.prefetchrows = arraysize
+
+                cursor.execute(_strip_terminator(sql), params or {})
+
+                if not batch_size:
+                    yield from cursor
+                    return
+
+                column_names = [column[0] for column in cursor.description]
+
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+
+                    if columnar:
+                        columns = zip(*batch)
+                        if numpy:
+                            yield {name: numpy.array(values) for name, values in zip(column_names, columns)}
+                        else:
+                            yield {name: list(values) for name, values in zip(column_names, columns)}
+                    else:
+                        yield batch
+            finally:
+                cursor.close()
+
+    def bulk_load(self, table, rows, columns=None, batch_size=DEFAULT_BATCH_SIZE, commit_every=10, header=True):  # pylint: disable=too-many-arguments,too-many-locals
+        """Insert rows into a table in batches.
+
+        Rows are streamed from any iterable of sequences, or from a CSV file, and inserted `batch_size` rows at a
+        time with array binding, so each batch is a single round trip. Rows the database rejects (e.g., constraint
+        violations or bad values) are collected instead of aborting the load; the rest of their batch is still
+        inserted. The load is committed every `commit_every` batches and at the end. If a batch fails as a whole
+        (e.g., the table does not exist), the uncommitted batches are rolled back and the error is raised.
+
+        A sample of the returned report:
+
+            {
+                'table': 'BUILDS',
+                'rows': 1000000,
+                'loaded': 999998,
+                'errors': [{'row': 5123, 'error': 'ORA-01722: invalid number', 'values': ('x', 'abc')}, ...],
+                'batches': 1000,
+                'commits': 100,
+                'duration': 41.2,
+                'rows_per_second': 24271.8
+            }
+
+        :param table:           Name of the table. It is used as is in the SQL, so it must not come from user input.
+        :type table:            str
+        :param rows:            Iterable of rows (each a list or tuple of values), or the path to a CSV file
+        :type rows:             iterable or str
+        :param columns:         (Optional) Names of the columns the values are inserted into. Defaults to the header
+                                of the CSV file, or to every column of the table in order. Names must be plain
+                                identifiers (a letter followed by letters, digits, `_`, `$` or `#`).
+        :type columns:          list
+        :param batch_size:      (Optional) Number of rows inserted per round trip
+        :type batch_size:       int
+        :param commit_every:    (Optional) Number of batches between commits
+        :type commit_every:     int
+        :param header:          (Optional) Set this to `False` if the CSV file has no header row
+        :type header:           bool
+        :return:                Report of the load. The `row` of an error is the 0-based position of the row in
+                                `rows`, not counting a CSV header.
+        :rtype:                 dict
+        :raises:                ValueError
+        """
+        if batch_size < 1 or commit_every < 1:
+            raise ValueError('`batch_size` and `commit_every` must be at least 1')
+
+        report = {'table': table, 'rows': 0, 'loaded': 0, 'errors': [], 'batches': 0, 'commits': 0}
+        start = time.monotonic()
+
+        with ExitStack() as stack:
+            if isinstance(rows, str):
+                rows = csv.reader(stack.enter_context(open(rows, 'r', newline='', encoding='utf-8')))
+                if header:
+                    csv_columns = next(rows, None)
+                    columns = columns or csv_columns
+
+            invalid = [column for column in columns or [] if not IDENTIFIER.match(column)]
+            if invalid:
+                raise ValueError(f'Invalid column names for {table}: {", ".join(repr(column) for column in invalid)}')
+
+            rows = iter(rows)
+
+            with self.acquire() as (connection, cursor):
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    return self._bulk_load_report(report, start)
+
+                placeholders = ', '.join(f':{index}' for index in range(1, len(batch[0]) + 1))
+                column_list = f' ({", ".join(columns)})' if columns else ''
+                sql = f'INSERT INTO {table}{column_list} VALUES ({placeholders})'
+
+                self.log.info(f'Loading rows into {table} in batches of {batch_size}...')
+
+                try:
+                    while batch:
+                        cursor.executemany(sql, batch, batcherrors=True)
+
+                        for error in cursor.getbatcherrors():
+                            report['errors'].append({'row': report['rows'] + error.offset, 'error': error.message,
+                                                     'values': tuple(batch[error.offset])})
+
+                        report['rows'] += len(batch)
+                        report['batches'] += 1
+
+                        if report['batches'] % commit_every == 0:
+                            connection.commit()
+                            report['commits'] += 1
+                            elapsed = time.monotonic() - start
+                            self.log.info(f'Loaded {report["rows"]} rows into {table} '
+                                          f'({report["rows"] / elapsed:.0f} rows/s)')
+
+                        batch = list(itertools.islice(rows, batch_size))
+
+                    connection.commit()
+                    report['commits'] += 1
+                except cx_Oracle.DatabaseError:  # pylint: disable=c-extension-no-member
+                    connection.rollback()
+                    raise
+
+        return self._bulk_load_report(report, start)
+
+    def _bulk_load_report(self, report, start):
+        """Finish and log the report of a bulk load.
+
+        :param report:  Counters of the load
+        :type report:   dict
+        :param start:   Monotonic time the load started at
+        :type start:    float
+        :return:        The completed report
+        :rtype:         dict
+        """
+        report['loaded'] = report['rows'] - len(report['errors'])
+        report['duration'] = time.monotonic() - start
+        report['rows_per_second'] = report['rows'] / report['duration'] if report['duration'] else 0.0
+
+        for error in report['errors']:
+            self.log.warning(f'Row {error["row"]} was not loaded into {report["table"]}: {error["error"]}')
+
+        self.log.info(f'Loaded {report["loaded"]} of {report["rows"]} rows into {report["table"]} in '
+                      f'{report["duration"]:.2f}s ({report["rows_per_second"]:.0f} rows/s)')
+
+        return report
+
     def close(self):
         """Close the DB connection.
 
-        Closes the connection to the database.
+        Closes the connection to the database, and the session pool if one was created.
 
         :return:    None
         :rtype:     None
@@ -78,6 +520,56 @@ class OracleDatabase:
         if self.connection_object:
             self.connection_object.close()
 
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+
+    def _connection_params(self):
+        """Get the parameters used to connect to the database.
+
+        :return:    Connection parameters
+        :rtype:     dict
+        """
+        connection_params = {
+            'user': self.db_user,
+            'password': self.db_passwd,
+            'dsn': f'{self.db_hostname}/{self.service_name}'
+        }
+
+        if self.db_user_role:
+            connection_params['mode'] = getattr(cx_Oracle, self.db_user_role.upper())
+
+        return connection_params
+
+    def _retry_connection(self, connect_func, max_attempts, sleep_time):
+        """Call a connection function until it succeeds or the attempts are exhausted.
+
+        :raises                 DatabaseConnectionFailed
+        :param connect_func     Function that connects to the database
+        :type connect_func      function
+        :param max_attempts     The maximum number of times the connection will be attempted before failing
+        :type max_attempts      int
+        :param sleep_time       The wait time between attempts, in seconds
+        :type sleep_time        int
+        :return:                The return value of `connect_func`
+        """
+        count = 0
+
+        while count < max_attempts:
+            count += 1
+
+            self.log.info(f'Connection attempt {count}/{max_attempts}')
+
+            try:
+                return connect_func()
+            except cx_Oracle.DatabaseError as dbe:  # pylint: disable=c-extension-no-member
+                self.log.warning(f'Connection attempt failed; error: {dbe}')
+                if count < max_attempts:
+                    self.log.info(f'Database not ready; sleeping for {sleep_time} seconds...')
+                    time.sleep(sleep_time)
+
+        raise DatabaseConnectionFailed('Unable to establish a connection to the database.')
+
     def connect(self, max_attempts=15, sleep_time=30):
         """Create a database connection.
 
@@ -93,37 +585,201 @@ class OracleDatabase:
         :return:                True if connection is successful
         :rtype:                 bool
         """
-        count = 0
+        connection_params = self._connection_params()
 
-        connection_params = {
-            'user': self.db_user,
-            'password': self.db_passwd,
-            'dsn': f'{self.db_hostname}/{self.service_name}'
-        }
+        self.log.info(f'Using connection parameters: {connection_params}')
+        self.log.info('Attempting database connection...')
+
+        self.connection_object = self._retry_connection(
+            lambda: cx_Oracle.connect(**connection_params),  # pylint: disable=c-extension-no-member
+            max_attempts, sleep_time
+        )
+        self.log.info('Successfully connected to the database!')
+
+        self.connection_object.stmtcachesize = self.stmt_cache_size
+
+        if not self.cursor:
+            self.cursor = self.connection_object.cursor()
+
+        return True
+
+    def create_pool(self, min_sessions=1, max_sessions=4, increment=1, max_attempts=15, sleep_time=30):  # pylint: disable=too-many-arguments
+        """Create a session pool.
+
+        Once the pool exists, `run_sql`, `run_sql_script` and `acquire` use connections from it instead of the
+        global connection. The pool starts with `min_sessions` sessions and opens `increment` more at a time when
+        they are all busy, up to `max_sessions`; beyond that `acquire()` waits for a session to be released.
+        Creating the pool is retried like `connect()`.
+
+        Session pools can't use administrative roles, so `db_user_role` must be empty to use a pool.
 
+        :raises                 DatabaseConnectionFailed
+        :param min_sessions     The number of sessions opened when the pool is created
+        :type min_sessions      int
+        :param max_sessions     The maximum number of sessions in the pool
+        :type max_sessions      int
+        :param increment        The number of sessions opened when the pool needs to grow
+        :type increment         int
+        :param max_attempts     The maximum number of times the connection will be attempted before failing
+        :type max_attempts      int
+        :param sleep_time       The wait time between attempts, in seconds
+        :type sleep_time        int
+        :return:                True if the pool was created
+        :rtype:                 bool
+        """
         if self.db_user_role:
-            connection_params['mode'] = getattr(cx_Oracle, self.db_user_role.upper())
+            raise DatabaseConnectionFailed(f'Session pools can\'t connect with the {self.db_user_role} role; set '
+                                           f'`db_user_role` to an empty value to use a pool.')
 
-        self.log.info(f'Using connection parameters: {connection_params}')
-        self.log.info('Attempting database connection...')
+        connection_params = self._connection_params()
 
-        while count < max_attempts:
-            count += 1
+        self.log.info(f'Creating a session pool of {min_sessions}-{max_sessions} sessions as {self.db_user} on '
+                      f'{connection_params["dsn"]}...')
 
-            self.log.info(f'Connection attempt {count}/{max_attempts}')
+        self.pool = self._retry_connection(
+            lambda: cx_Oracle.SessionPool(  # pylint: disable=c-extension-no-member
+                min=min_sessions, max=max_sessions, increment=increment, threaded=True,
+                getmode=cx_Oracle.SPOOL_ATTRVAL_WAIT, **connection_params  # pylint: disable=c-extension-no-member
+            ),
+            max_attempts, sleep_time
+        )
+        self.log.info('Successfully created the session pool!')
+
+        return True
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a connection and a cursor.
+
+        With a session pool, a connection is taken from the pool and checked with a ping first; connections that
+        fail the check are dropped from the pool and another one is taken. The cursor is closed and the connection
+        is returned to the pool when the block exits, which rolls back anything that wasn't committed. Without a
+        pool the global connection and cursor are used.
+
+            with db.acquire() as (connection, cursor):
+                cursor.execute('SELECT ...')
+
+        :return:    Context manager yielding a connection and a cursor
+        :rtype:     tuple(cx_Oracle.Connection, cx_Oracle.Cursor)
+        """
+        if not self.pool:
+            yield self.connection_object, self.cursor
+        else:
+            connection = self._borrow_connection()
+            cursor = connection.cursor()
 
             try:
-                self.connection_object = cx_Oracle.connect(**connection_params)  # pylint: disable=c-extension-no-member
-                self.log.info('Successfully connected to the database!')
+                yield connection, cursor
+            finally:
+                cursor.close()
+                self.pool.release(connection)
 
-                if not self.cursor:
-                    self.cursor = self.connection_object.cursor()
+    def _borrow_connection(self):
+        """Take a healthy connection from the session pool.
 
-                return True
+        :return:    Connection from the pool
+        :rtype:     cx_Oracle.Connection
+        """
+        # Every session in the pool could have gone stale, e.g. after the database restarted
+        for _ in range(self.pool.max + 1):
+            connection = self.pool.acquire()
+
+            try:
+                connection.ping()
             except cx_Oracle.DatabaseError as dbe:  # pylint: disable=c-extension-no-member
-                self.log.warning(f'Connection attempt failed; error: {dbe}')
-                if count < max_attempts:
-                    self.log.info(f'Database not ready; sleeping for {sleep_time} seconds...')
-                    time.sleep(sleep_time)
-                else:
-                    raise DatabaseConnectionFailed('Unable to establish a connection to the database.')
+                self.log.warning(f'Dropping a pooled connection that failed its health check; error: {dbe}')
+                with self._pool_lock:
+                    self._pool_counters['health_check_failures'] += 1
+                self.pool.drop(connection)
+                continue
+
+            with self._pool_lock:
+                self._pool_counters['acquired'] += 1
+
+            connection.stmtcachesize = self.stmt_cache_size
+            return connection
+
+        raise DatabaseConnectionFailed('Unable to get a healthy connection from the session pool.')
+
+    def pool_stats(self):
+        """Get statistics of the session pool.
+
+        :return:    Sizing of the pool, the number of `opened` and `busy` sessions, the number of connections
+                    `acquired` through `acquire()` and the number of `health_check_failures`, or None if there is
+                    no pool
+        :rtype:     dict
+        """
+        if not self.pool:
+            return None
+
+        with self._pool_lock:
+            counters = dict(self._pool_counters)
+
+        return {
+            'min': self.pool.min,
+            'max': self.pool.max,
+            'increment': self.pool.increment,
+            'opened': self.pool.opened,
+            'busy': self.pool.busy,
+            **counters,
+        }
+
+
+def _strip_terminator(sql):
+    """Remove the trailing semicolon Oracle rejects from a SQL statement.
+
+    PL/SQL blocks are left alone, since the semicolon after their final END is part of the block.
+
+    :param sql: SQL statement
+    :type sql:  str
+    :return:    SQL statement without the trailing semicolon
+    :rtype:     str
+    """
+    sql = sql.strip()
+
+    if sql.endswith(';') and not is_plsql_block(sql):
+        sql = sql[:-1].rstrip()
+
+    return sql
+
+
+def _split_script(sql_file_path, splitter):
+    """Split a SQL script into statements.
+
+    :param sql_file_path:   The path of the SQL file to split
+    :type sql_file_path:    str
+    :param splitter:        `sqlparse` or `stream`; see `OracleDatabase.run_sql_script`
+    :type splitter:         str
+    :return:                The statements of the script
+    :rtype:                 iterable
+    """
+    if splitter == 'stream':
+        return split_sql_file(sql_file_path)
+
+    if splitter == 'sqlparse':
+        with open(sql_file_path, 'r') as sql_file:
+            return sqlparse.split(sql_file.read())
+
+    raise ValueError(f'Unknown SQL splitter: {splitter}')
+
+
+def _check_acyclic(waiting_on):
+    """Make sure script dependencies don't form a cycle.
+
+    :param waiting_on:  Dict of script -> set of scripts it depends on
+    :type waiting_on:   dict
+    :return:            None
+    :rtype:             None
+    :raises:            ValueError
+    """
+    remaining = {script: set(required) for script, required in waiting_on.items()}
+
+    while remaining:
+        ready = [script for script, required in remaining.items() if not required]
+        if not ready:
+            raise ValueError(f'The dependencies between these scripts form a cycle: {", ".join(sorted(remaining))}')
+
+        for script in ready:
+            del remaining[script]
+        for required in remaining.values():
+            required.difference_update(ready)
@@ -0,0 +1,171 @@
+"""
+Incremental splitter for Oracle SQL scripts
+"""
+import logging
+import re
+import time
+
+import sqlparse
+
+
+# Size of the chunks SQL scripts are read in
+SCRIPT_CHUNK_SIZE = 1024 * 1024
+
+# Statements that are PL/SQL, which must keep the semicolon after their final END
+PLSQL_BLOCK = re.compile(
+    r'^(DECLARE|BEGIN|CREATE\s+(OR\s+REPLACE\s+)?((NON)?EDITIONABLE\s+)?'
+    r'(FUNCTION|LIBRARY|PACKAGE|PROCEDURE|TRIGGER|TYPE))\b',
+    re.IGNORECASE
+)
+
+# Comments and whitespace at the start of a statement
+LEADING_COMMENTS = re.compile(r'^(\s+|--[^\n]*(\n|$)|/\*.*?\*/)+', re.DOTALL)
+
+# Everything that changes the state of the splitter outside of quotes and comments: string and identifier quotes,
+# comments, statement terminators and q-quoted strings (q'[...]', nq'!...!', etc.)
+SQL_TOKEN = re.compile(r"""(?<![\w$#])[nN]?[qQ]'|'|"|--|/\*|;""")
+
+# Closing delimiters of q-quoted strings that open with a bracket
+Q_QUOTE_CLOSE = {'[': ']', '{': '}', '(': ')', '<': '>'}
+
+
+def is_plsql_block(sql):
+    """Check whether a statement is a PL/SQL block or creates a stored PL/SQL unit.
+
+    :param sql: SQL statement
+    :type sql:  str
+    :return:    True if the statement is PL/SQL
+    :rtype:     bool
+    """
+    return bool(PLSQL_BLOCK.match(LEADING_COMMENTS.sub('', sql)))
+
+
+def split_sql_file(sql_file_path, chunk_size=SCRIPT_CHUNK_SIZE):  # pylint: disable=too-many-branches,too-many-statements
+    """Split a SQL script into statements as it is read.
+
+    The script is read in chunks and each statement is yielded as soon as its end is reached, so memory use does
+    not depend on the size of the script. Statements are split the way SQL*Plus does it:
+
+    - SQL statements end with a `;`, which is not included in the statement.
+    - PL/SQL blocks (`DECLARE`, `BEGIN`, `CREATE PROCEDURE`, `CREATE PACKAGE`, etc.) end with a line containing only
+      a `/`, which is not included in the statement. The semicolons inside the block, including the one after the
+      final `END`, are kept.
+    - A line containing only a `/` also ends a SQL statement that has no `;`.
+
+    Semicolons and slashes inside string literals ('...'), quoted identifiers ("..."), q-quoted strings
+    (q'[...]') and comments are ignored. Comments are kept in the statement they precede or are part of, and
+    parts of the script that only contain comments are skipped.
+
+    :param sql_file_path:   The path of the SQL file to split
+    :type sql_file_path:    str
+    :param chunk_size:      (optional) Size of the chunks the file is read in, in bytes
+    :type chunk_size:       int
+    :return:                Generator yielding the statements of the script
+    :rtype:                 generator
+    """
+    statement = []
+    plsql = False
+
+    # Text that ends the quote or comment the splitter is in, if any
+    closing = None
+
+    with open(sql_file_path, 'r', buffering=chunk_size, encoding='utf-8') as sql_file:
+        for line in sql_file:
+            if closing is None and line.strip() == '/':
+                text = ''.join(statement)
+                if LEADING_COMMENTS.sub('', text):
+                    yield text.strip()
+                statement = []
+                plsql = False
+                continue
+
+            start = 0
+            pos = 0
+
+            while True:
+                if closing is not None:
+                    end = line.find(closing, pos)
+                    if end == -1:
+                        break
+
+                    pos = end + len(closing)
+
+                    # Two single quotes in a string literal are an escaped quote rather than the end of the string
+                    if closing == "'" and line.startswith("'", pos):
+                        pos += 1
+                        continue
+
+                    closing = None
+                    continue
+
+                match = SQL_TOKEN.search(line, pos)
+                if not match:
+                    break
+
+                token = match.group()
+                pos = match.end()
+
+                if token == '--':
+                    break
+                if token == '/*':
+                    closing = '*/'
+                elif token in ("'", '"'):
+                    closing = token
+                elif token.endswith("'"):
+                    delimiter = line[pos:pos + 1]
+                    if not delimiter or delimiter.isspace():
+                        # Not a valid q-quote; treat it as a normal string literal
+                        closing = "'"
+                    else:
+                        closing = Q_QUOTE_CLOSE.get(delimiter, delimiter) + "'"
+                        pos += 1
+                elif not plsql:
+                    text = ''.join(statement) + line[start:match.start()]
+
+                    if is_plsql_block(text):
+                        plsql = True
+                    else:
+                        if LEADING_COMMENTS.sub('', text):
+                            yield text.strip()
+                        statement = []
+                        start = pos
+
+            statement.append(line[start:])
+
+    text = ''.join(statement)
+    if LEADING_COMMENTS.sub('', text):
+        yield text.strip()
+
+
+def benchmark_split(sql_file_path, repeat=3):
+    """Compare `split_sql_file` with `sqlparse.split`.
+
+    Each splitter is timed `repeat` times and the fastest run is kept.
+
+    :param sql_file_path:   The path of the SQL file to split
+    :type sql_file_path:    str
+    :param repeat:          (optional) Number of times each splitter is timed
+    :type repeat:           int
+    :return:                Seconds taken and statements found by each splitter, and the speedup
+    :rtype:                 dict
+    """
+    def run_sqlparse():
+        with open(sql_file_path, 'r', encoding='utf-8') as sql_file:
+            return [sql_query for sql_query in sqlparse.split(sql_file.read()) if sql_query]
+
+    results = {}
+
+    for name, func in (('sqlparse', run_sqlparse), ('split_sql_file', lambda: list(split_sql_file(sql_file_path)))):
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            statements = func()
+            runs.append(time.perf_counter() - start)
+        results[name] = {'seconds': min(runs), 'statements': len(statements)}
+
+    results['speedup'] = results['sqlparse']['seconds'] / results['split_sql_file']['seconds']
+
+    logging.info(f'sqlparse: {results["sqlparse"]["seconds"]:.3f}s, split_sql_file: '
+                 f'{results["split_sql_file"]["seconds"]:.3f}s ({results["speedup"]:.1f}x faster)')
+
+    return results
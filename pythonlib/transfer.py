@@ -0,0 +1,183 @@
+"""
+Helpers for measuring and shaping the throughput of file transfers
+"""
+import threading
+import time
+
+
+class TransferStats:
+    """Counters for a single file transfer.
+
+    The counters are safe to update from several threads, so one instance can be shared by the segments of a
+    parallel download.
+    """
+
+    def __init__(self, name, direction, total_bytes=None, progress_callback=None):
+        self.name = name
+        self.direction = direction
+        self.total_bytes = total_bytes
+        self.progress_callback = progress_callback
+
+        self.bytes_transferred = 0
+        self.retries = 0
+        self.time_to_first_byte = None
+        self.started = time.monotonic()
+        self.finished = None
+
+        self._lock = threading.Lock()
+
+    @property
+    def duration(self):
+        """Seconds since the transfer started, or the total duration once it has finished"""
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self):
+        """Average throughput in MB/s"""
+        duration = self.duration
+        return self.bytes_transferred / duration / 1000000 if duration else 0.0
+
+    def add(self, num_bytes):
+        """Count bytes that were transferred and report progress.
+
+        :param num_bytes:   Number of bytes transferred, or a negative number to uncount bytes that will be sent again
+        :type num_bytes:    int
+        :return:            None
+        :rtype:             None
+        """
+        with self._lock:
+            self.bytes_transferred += num_bytes
+
+        if self.progress_callback:
+            self.progress_callback(self)
+
+    def finish(self):
+        """Mark the transfer as finished.
+
+        :return:    None
+        :rtype:     None
+        """
+        self.finished = time.monotonic()
+
+        if self.progress_callback:
+            self.progress_callback(self)
+
+    def as_dict(self):
+        """Get the counters as a dict.
+
+        :return:    The transfer counters
+        :rtype:     dict
+        """
+        return {
+            'name': self.name,
+            'direction': self.direction,
+            'bytes': self.bytes_transferred,
+            'total_bytes': self.total_bytes,
+            'duration': self.duration,
+            'throughput': self.throughput,
+            'time_to_first_byte': self.time_to_first_byte,
+            'retries': self.retries,
+        }
+
+    def __str__(self):
+        ttfb = f'{self.time_to_first_byte:.3f}s' if self.time_to_first_byte is not None else 'n/a'
+        return (f'{self.direction} of {self.name}: {self.bytes_transferred} bytes in {self.duration:.2f}s '
+                f'({self.throughput:.2f} MB/s, time to first byte {ttfb}, {self.retries} retries)')
+
+
+class BandwidthLimiter:  # pylint: disable=too-few-public-methods
+    """Token bucket that caps the combined throughput of every transfer sharing it.
+
+    Each transfer calls `consume()` with the size of every chunk it moves. Tokens are added at `rate` bytes per
+    second up to `burst` bytes; once they run out, `consume()` sleeps until the transfer is back under the cap.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or rate
+
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, num_bytes):
+        """Take tokens for a chunk, sleeping if the cap has been reached.
+
+        :param num_bytes:   Size of the chunk, in bytes
+        :type num_bytes:    int
+        :return:            None
+        :rtype:             None
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+
+            # Chunks larger than the bucket are allowed to take it negative; the debt is paid off by sleeping
+            self._tokens -= num_bytes
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if wait:
+            time.sleep(wait)
+
+
+class MeteredReader:
+    """File object wrapper that counts and throttles the data read from it.
+
+    Used as a request body so uploads report progress and respect a `BandwidthLimiter`. Seeking back before the
+    data that was already counted (e.g., to send the body again after a failed attempt) takes those bytes off the
+    count, so a retried upload is not counted twice. Everything other than `read()` and `seek()` is passed through
+    to the wrapped file.
+    """
+
+    def __init__(self, handle, stats, limiter=None):
+        self.handle = handle
+        self.stats = stats
+        self.limiter = limiter
+
+        # Position in the file up to which the data read has been counted
+        self._counted_to = handle.tell()
+
+    def read(self, size=-1):
+        """Read from the wrapped file, counting and throttling the data"""
+        data = self.handle.read(size)
+
+        if data:
+            if self.limiter:
+                self.limiter.consume(len(data))
+            self.stats.add(len(data))
+            self._counted_to += len(data)
+
+        return data
+
+    def seek(self, offset, whence=0):
+        """Seek the wrapped file, uncounting the counted data that will be read again"""
+        position = self.handle.seek(offset, whence)
+
+        if position < self._counted_to:
+            self.stats.add(position - self._counted_to)
+            self._counted_to = position
+
+        return position
+
+    def __getattr__(self, name):
+        return getattr(self.handle, name)
+
+
+def metered_chunks(chunks, stats, limiter=None):
+    """Count and throttle the chunks of a streamed request body.
+
+    :param chunks:  Iterable of byte strings
+    :type chunks:   iterable
+    :param stats:   Counters of the transfer
+    :type stats:    TransferStats
+    :param limiter: (Optional) Bandwidth limiter shared by the client's transfers
+    :type limiter:  BandwidthLimiter
+    :return:        Generator yielding the same chunks
+    :rtype:         generator
+    """
+    for chunk in chunks:
+        if limiter:
+            limiter.consume(len(chunk))
+        stats.add(len(chunk))
+        yield chunk
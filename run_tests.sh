@@ -32,12 +32,18 @@ function run_pylint() {
     run_wrapper 'pip3 install -U -r requirements.txt && pylint --msg-template="{path}:{line}:{column}:{C}:({symbol}){msg}" pythonlib' python:3.8
 }
 
+function run_unittest() {
+    echo "Running unit tests"
+    run_wrapper 'pip3 install -U -r requirements.txt && python3 -m unittest discover -s tests -t .' python:3.8
+}
+
 function run_all() {
     echo "Running all tests"
     local failed_tests=()
 
     run_shellcheck || failed_tests+=("Shellcheck")
     run_pylint || failed_tests+=("pylint")
+    run_unittest || failed_tests+=("unittest")
 
     if [[ "${#failed_tests[@]}" -gt 0 ]]; then
         echo "FAILED TESTS: ${failed_tests[*]}"
@@ -58,6 +64,9 @@ while test $# -gt 0; do
         --shellcheck)
             run_shellcheck
             shift;;
+        --unittest)
+            run_unittest
+            shift;;
         --)
             shift
             run_all
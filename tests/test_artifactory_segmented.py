@@ -0,0 +1,120 @@
+"""
+Tests for segmented, resumable downloads against a local HTTP server that supports Range requests
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pythonlib.artifactory import Artifactory, ArtifactoryRequestException, RetryPolicy
+
+
+SEGMENT_SIZE = 1000
+CONTENT = os.urandom(4500)
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves `CONTENT` at any path, honouring single byte ranges and failing the ranges in `server.fail_starts`"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+    def _send_headers(self, status, length, extra_headers=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('X-Checksum-Sha256', self.server.checksum)
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        """Describe the artifact"""
+        self._send_headers(200, len(CONTENT))
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve the artifact or one byte range of it"""
+        match = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range', ''))
+        if not match:
+            self._send_headers(200, len(CONTENT))
+            self.wfile.write(CONTENT)
+            return
+
+        start, end = int(match.group(1)), int(match.group(2))
+        self.server.requested.append(start)
+
+        if start in self.server.fail_starts:
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self._send_headers(206, end - start + 1, {'Content-Range': f'bytes {start}-{end}/{len(CONTENT)}'})
+        self.wfile.write(CONTENT[start:end + 1])
+
+
+class RetrieveFileSegmentedTest(unittest.TestCase):
+    """Tests for `Artifactory.retrieve_file_segmented`"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+        self.server.checksum = hashlib.sha256(CONTENT).hexdigest()
+        self.server.fail_starts = set()
+        self.server.requested = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.local_file = os.path.join(self.temp_dir.name, 'big.bin')
+
+        self.artifactory = Artifactory(f'http://127.0.0.1:{self.server.server_port}/artifactory', 'token',
+                                       max_workers=2, retry_policy=RetryPolicy(max_retries=0))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def download(self):
+        """Run a segmented download of the test artifact"""
+        return self.artifactory.retrieve_file_segmented('repo', 'big.bin', self.local_file, segment_size=SEGMENT_SIZE)
+
+    def test_resume_fetches_only_missing_segments(self):
+        """An interrupted download keeps its finished segments and the rerun only requests the missing range"""
+        self.server.fail_starts = {2000}
+
+        with self.assertRaises(ArtifactoryRequestException):
+            self.download()
+
+        self.assertFalse(os.path.exists(self.local_file))
+        with open(f'{self.local_file}.part.state', 'r') as handle:
+            self.assertEqual(json.load(handle)['completed'], [0, 1, 3, 4])
+
+        self.server.fail_starts = set()
+        self.server.requested = []
+
+        self.assertEqual(self.download(), self.local_file)
+        self.assertEqual(self.server.requested, [2000])
+
+        with open(self.local_file, 'rb') as handle:
+            self.assertEqual(handle.read(), CONTENT)
+        self.assertFalse(os.path.exists(f'{self.local_file}.part'))
+        self.assertFalse(os.path.exists(f'{self.local_file}.part.state'))
+
+    def test_checksum_mismatch_removes_partial_files(self):
+        """A download that doesn't match Artifactory's checksum leaves nothing behind"""
+        self.server.checksum = hashlib.sha256(b'something else').hexdigest()
+
+        with self.assertRaises(ArtifactoryRequestException):
+            self.download()
+
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Tests for splitting Oracle SQL scripts into statements
+"""
+import os
+import tempfile
+import unittest
+
+from pythonlib.db import _strip_terminator
+from pythonlib.sql_splitter import split_sql_file
+
+
+class SplitSqlFileTest(unittest.TestCase):
+    """Tests for `split_sql_file`"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.sql_file = os.path.join(self.temp_dir.name, 'script.sql')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def split(self, script, chunk_size=None):
+        """Write a script to disk and split it"""
+        with open(self.sql_file, 'w', encoding='utf-8') as handle:
+            handle.write(script)
+
+        if chunk_size:
+            return list(split_sql_file(self.sql_file, chunk_size))
+        return list(split_sql_file(self.sql_file))
+
+    def test_statements_end_at_semicolons(self):
+        """SQL statements are split at their semicolons, which are dropped"""
+        self.assertEqual(self.split('SELECT 1 FROM dual;\nSELECT 2 FROM dual; SELECT 3 FROM dual;\n'),
+                         ['SELECT 1 FROM dual', 'SELECT 2 FROM dual', 'SELECT 3 FROM dual'])
+
+    def test_escaped_quotes(self):
+        """Two single quotes in a string don't end it"""
+        self.assertEqual(self.split("INSERT INTO t VALUES ('it''s; fine');\nSELECT 1 FROM dual;\n"),
+                         ["INSERT INTO t VALUES ('it''s; fine')", 'SELECT 1 FROM dual'])
+
+    def test_q_quoted_strings(self):
+        """Semicolons and quotes inside q-quoted strings are ignored"""
+        self.assertEqual(self.split("INSERT INTO t VALUES (q'[a; 'b']', Q'!c;!');\nSELECT 1 FROM dual;\n"),
+                         ["INSERT INTO t VALUES (q'[a; 'b']', Q'!c;!')", 'SELECT 1 FROM dual'])
+
+    def test_comments(self):
+        """Semicolons in comments are ignored and comments stay with the statement that follows them"""
+        script = '/* first; statement */ SELECT 1 FROM dual;\n-- second; statement\nSELECT 2 FROM dual;\n-- done;\n'
+
+        self.assertEqual(self.split(script),
+                         ['/* first; statement */ SELECT 1 FROM dual', '-- second; statement\nSELECT 2 FROM dual'])
+
+    def test_slash_line_inside_string(self):
+        """A line with only a slash inside a string literal doesn't end the statement"""
+        self.assertEqual(self.split("INSERT INTO t VALUES ('a\n/\nb');\nSELECT 1 FROM dual;\n"),
+                         ["INSERT INTO t VALUES ('a\n/\nb')", 'SELECT 1 FROM dual'])
+
+    def test_slash_ends_statement_without_semicolon(self):
+        """A line with only a slash ends a SQL statement that has no semicolon"""
+        self.assertEqual(self.split('SELECT 1 FROM dual\n/\nSELECT 2 FROM dual;\n'),
+                         ['SELECT 1 FROM dual', 'SELECT 2 FROM dual'])
+
+    def test_plsql_blocks(self):
+        """Procedures, triggers and anonymous blocks run until the slash and keep their semicolons"""
+        procedure = 'CREATE OR REPLACE PROCEDURE p AS\nBEGIN\n  NULL;\nEND;'
+        trigger = ('CREATE OR REPLACE TRIGGER t_bi BEFORE INSERT ON t FOR EACH ROW\nBEGIN\n'
+                   "  :new.note := 'a;b';\nEND;")
+        block = 'DECLARE\n  x NUMBER := 1;\nBEGIN\n  UPDATE t SET n = x;\nEND;'
+
+        script = f'{procedure}\n/\n{trigger}\n/\nSELECT 1 FROM dual;\n{block}\n/\n'
+
+        self.assertEqual(self.split(script), [procedure, trigger, 'SELECT 1 FROM dual', block])
+
+    def test_small_chunks(self):
+        """The statements don't depend on the size of the chunks the file is read in"""
+        script = ("INSERT INTO t VALUES ('it''s; fine');\n/* x; y */ SELECT 1 FROM dual;\n"
+                  'BEGIN\n  NULL;\nEND;\n/\n')
+
+        self.assertEqual(self.split(script, chunk_size=8), self.split(script))
+
+    def test_comment_only_script(self):
+        """Scripts that only contain comments have no statements"""
+        self.assertEqual(self.split('-- nothing; here\n/* or; here */\n'), [])
+
+
+class StripTerminatorTest(unittest.TestCase):
+    """Tests for `_strip_terminator`"""
+
+    def test_sql_statement(self):
+        """The trailing semicolon of a SQL statement is removed"""
+        self.assertEqual(_strip_terminator('  SELECT 1 FROM dual ; \n'), 'SELECT 1 FROM dual')
+        self.assertEqual(_strip_terminator('SELECT 1 FROM dual'), 'SELECT 1 FROM dual')
+
+    def test_plsql_block(self):
+        """The semicolon after the final END of a PL/SQL block is kept"""
+        self.assertEqual(_strip_terminator('BEGIN\n  NULL;\nEND;\n'), 'BEGIN\n  NULL;\nEND;')
+        self.assertEqual(_strip_terminator('-- setup\nCREATE OR REPLACE PROCEDURE p AS\nBEGIN\n  NULL;\nEND;'),
+                         '-- setup\nCREATE OR REPLACE PROCEDURE p AS\nBEGIN\n  NULL;\nEND;')
+
+
+if __name__ == '__main__':
+    unittest.main()